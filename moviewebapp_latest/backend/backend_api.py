@@ -1,5 +1,5 @@
 """To able use backend user has to sign in to get access storage instance"""
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, url_for
 from flask_login import (
     LoginManager,
     login_required,
@@ -7,32 +7,45 @@ from flask_login import (
     login_user,
     current_user,
 )
-from datamanagement.sqlite_data_manager import db
 import frontend.forms_and_session_methods as ffasm
+from datamanagement.sqlite_data_manager import SqliteStorage
 from backend.request_movie import extract_movie_data, RequestErrors
 from frontend.movie_wtf import UserForm
 
 app = Flask(__name__)
 app.secret_key = "mysecretkey"
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{ffasm.SQLITE_STORAGE_PATH}"
-
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+ffasm.SQLITE_STORAGE.init_app(app, profile=ffasm.SQLITE_PROFILE)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "api_login"
 
 
-def get_users(storage):
+def get_users(storage, after_id=None, limit=None, after_name=None):
     """Returns Sqlite database users tables users records"""
-    users = storage.get_all_users()
+    if isinstance(storage, SqliteStorage):
+        return storage.user_rows(after_id=after_id, limit=limit, after_name=after_name)
+    users = storage.get_all_users(
+        after_id=after_id, limit=limit, after_name=after_name
+    )
     if not isinstance(users, dict):
         users_dict = [user.to_dict() for user in users]
     return users_dict
 
 
+def paged_response(records: list, limit: int, keys=("id",)):
+    """JSON list response of records fetched with limit + 1, a page which
+    is not the last one carries the next page URL in its Link header"""
+    records, next_cursor = ffasm.split_page(records, limit, keys)
+    response = jsonify(records)
+    if next_cursor is not None:
+        next_url = url_for(
+            request.endpoint, **request.view_args, **next_cursor, limit=limit
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+
 @login_manager.user_loader
 def load_user(user_id):
     """Gets flask sessin object user key to assing storage type"""
@@ -78,8 +91,14 @@ def api_add_user():
 def api_list_users():
     """Display saved users in the related database."""
     _, storage = ffasm.get_user_and_storage()
-    users_dict = get_users(storage)
-    return jsonify(users_dict)
+    after_id, limit = ffasm.page_args()
+    users_dict = get_users(
+        storage,
+        after_id=after_id,
+        limit=limit + 1,
+        after_name=request.args.get("after_name"),
+    )
+    return paged_response(users_dict, limit, keys=("name", "id"))
 
 
 @app.route("/api/user-update/<int:user_id>", methods=["PUT"])
@@ -127,12 +146,38 @@ def api_user_movies(user_id):
     user = storage.find_user(user_id=user_id)
     if not user:
         return jsonify({"warning": "User does not exist"}), 404
+    after_id, limit = ffasm.page_args()
     try:
-        movies = storage.get_user_movies(user_id=user_id)
-        movies_dict = [movie.to_dict() for movie in movies]
+        if isinstance(storage, SqliteStorage):
+            movies_dict = storage.user_movie_rows(
+                user_id=user_id, after_id=after_id, limit=limit + 1
+            )
+        else:
+            movies = storage.get_user_movies(
+                user_id=user_id, after_id=after_id, limit=limit + 1
+            )
+            movies_dict = [movie.to_dict() for movie in movies]
     except ffasm.IMPORTED_ERRORS as movie_err:
         return jsonify({"error": f"Movie ID is not valid: {movie_err}"}), 404
-    return jsonify(movies_dict)
+    return paged_response(movies_dict, limit)
+
+
+@app.route("/api/search", methods=["GET"])
+def api_search():
+    """Ranked full text search over SQLite movie titles and reviews,
+    a page which is not the last one carries the next page URL in its
+    Link header"""
+    words = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    _, limit = ffasm.page_args()
+    results = ffasm.SQLITE_STORAGE.search(
+        words, page=page, limit=limit, fetch=limit + 1
+    )
+    response = jsonify(results[:limit])
+    if len(results) > limit:
+        next_url = url_for("api_search", q=words, page=page + 1, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 @app.route("/api/movies/add", methods=["POST"])
@@ -58,6 +58,7 @@ def extract_movie_data(movie_name):
     """Extract Title, Director, Year, imdbRating"""
     movie = get_by_name(movie_name)
     extracted_movie_data = {
+        "imdbID": movie.get("imdbID"),
         "Title": movie.get("Title"),
         "Year": movie.get("Year", "Not provided"),
         "imdbRating": movie.get("imdbRating", 0.0),
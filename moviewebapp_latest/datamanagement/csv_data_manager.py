@@ -7,15 +7,90 @@ those relationships"""
 
 
 import csv
-import pandas as pd
+import threading
 from werkzeug.security import check_password_hash
 
 
 # from .storage_inheritance import os, DataManagmentInterface as DMI
 
-from datamanagement.storage_inheritance import os, DataManagmentInterface as DMI
+from datamanagement.storage_inheritance import (
+    os,
+    changes_snapshot,
+    request_snapshot,
+    synchronized,
+    DataManagmentInterface as DMI,
+)
+from datamanagement.storage_index import StorageIndex
+from datamanagement.sequence_store import SequenceStore
+from datamanagement.csv_rows import MovieRow, UserRow, row_reader
 from user.user_instance import User
 
+USER_FIELDS = list(UserRow.__slots__)
+MOVIE_FIELDS = list(MovieRow.__slots__)
+# Append only movies.csv schema, latest row of a movie ID wins and
+# a row with tombstone "1" marks the movie deleted
+MOVIE_LOG_FIELDS = MOVIE_FIELDS + ["tombstone"]
+
+
+def _row_dict(header: list, row: list) -> dict:
+    """Maps row values on header fields like csv.DictReader"""
+    return {
+        field: row[position] if position < len(row) else None
+        for position, field in enumerate(header)
+    }
+
+
+def scan_rows(file_name):
+    """Yields (byte offset, row dictionary) of every record in the CSV file"""
+    with open(file_name, "rb") as handle:
+        position = 0
+
+        def lines():
+            nonlocal position
+            for line in handle:
+                position += len(line)
+                yield line.decode("utf-8")
+
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        start = position
+        for row in reader:
+            if row:
+                yield start, _row_dict(header, row)
+            start = position
+
+
+class OrderedLocks:
+    """Several locks held as one: taken in the given order and released in
+    reverse, so storages sharing some of them can not deadlock"""
+
+    def __init__(self, *locks) -> None:
+        self._locks = locks
+
+    def __enter__(self):
+        for lock in self._locks:
+            lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self._locks):
+            lock.release()
+
+
+def read_rows(file_name, offsets, row_type) -> list:
+    """Reads records starting at given byte offsets of the CSV file
+    as row_type (UserRow or MovieRow) rows"""
+    rows = []
+    with open(file_name, "rb") as handle:
+        header = next(csv.reader([handle.readline().decode("utf-8")]))
+        make_row = row_reader(row_type, header)
+        for offset in offsets:
+            handle.seek(offset)
+            row = next(csv.reader(line.decode("utf-8") for line in handle), None)
+            if row:
+                rows.append(make_row(row))
+    return rows
+
 
 class CsvStorageErrors(Exception):
     """CsvStorageErrors is a class for raising errors."""
@@ -25,63 +100,168 @@ class CsvStorageErrors(Exception):
 
 
 class CsvStorage(DMI):
-    """This class is used to store movies in a csv file."""
-
-    def __init__(self, filename) -> None:
+    """This class is used to store movies in a csv file.
+    In append only schema movie changes touch only movies.csv: new, updated
+    and deleted (tombstone) rows are appended and a background thread
+    compacts the file once it holds COMPACT_AFTER dead rows"""
+
+    # Dead movie rows kept before movies.csv gets compacted
+    COMPACT_AFTER = 500
+    # movies.csv path -> lock shared by storages working on the same file
+    _movie_locks = {}
+    # users.csv path -> lock shared by storages of every movie file, they
+    # all keep their users in the same users.csv
+    _user_locks = {}
+
+    def __init__(self, filename, append_only: bool = False) -> None:
         if not os.path.exists(DMI.logs_dir):
             os.makedirs(DMI.logs_dir)
         user_file = os.path.join(DMI.logs_dir, "users.csv")
         self._user_file = user_file
         if not os.path.exists(user_file):
             self.initiate_user_file()
+        # username -> id, email -> id and id -> byte offset maps of users.csv
+        self._user_index = StorageIndex(user_file, ("username", "email"))
         movie_file = os.path.join(DMI.logs_dir, f"{filename}.csv")
         self._movie_file = movie_file
+        self._user_lock = CsvStorage._user_locks.setdefault(
+            user_file, threading.RLock()
+        )
+        self._movie_lock = CsvStorage._movie_locks.setdefault(
+            movie_file, threading.RLock()
+        )
+        # Public methods hold users.csv lock then the movie file lock, users.csv
+        # and sequences are changed along with movies.csv
+        self._lock = OrderedLocks(self._user_lock, self._movie_lock)
         if not os.path.exists(movie_file):
-            self.initiate_movie_file()
+            self.initiate_movie_file(append_only)
+        with open(movie_file, "r", encoding="utf-8") as read_csv:
+            header = next(csv.reader(read_csv), [])
+        self._movie_fields = MOVIE_LOG_FIELDS if "tombstone" in header else MOVIE_FIELDS
+        # id -> byte offset and user_id -> byte offsets maps of movies.csv
+        self._movie_index = StorageIndex(movie_file, (), ("user_id",))
+        # Last given user ID saved in users.csv.sequences, shared like
+        # users.csv, and last given movie ID saved in movies.csv.sequences
+        self._user_sequences = SequenceStore(
+            f"{user_file}.sequences", {"users": lambda: self._max_id(user_file)}
+        )
+        self._sequences = SequenceStore(
+            f"{movie_file}.sequences", {"movies": lambda: self._max_id(movie_file)}
+        )
+        if append_only and not self._append_only:
+            # Existing movies.csv gets the tombstone column
+            movies = self._read_movie_file()
+            self._movie_fields = MOVIE_LOG_FIELDS
+            self._write_movie_file(movies, mode="w")
+
+    @property
+    def _append_only(self) -> bool:
+        """True if movies.csv is in append only schema"""
+        return self._movie_fields == MOVIE_LOG_FIELDS
+
+    @staticmethod
+    def _max_id(file_name) -> int:
+        """Highest value of id column in given CSV file"""
+        if os.path.getsize(file_name) == 0:
+            return 0
+        with open(file_name, "r", encoding="utf-8") as read_csv:
+            reader = csv.DictReader(read_csv)
+            return max((int(row["id"]) for row in reader if row["id"]), default=0)
 
     def get_user_id(self):
-        """Reads csv file and return length + 1 value"""
-        if os.path.getsize(self._user_file) > 0:
-            df = pd.read_csv(self._user_file)
-            length = df.shape[0]
-            return str(length + 1)
-        return 1  # If file is empty, return 1
+        """Returns next ID of users sequence, IDs of deleted users
+        are not given again"""
+        return str(self._user_sequences.next_id("users"))
+
+    @staticmethod
+    def _load_index(index: StorageIndex, file_name) -> StorageIndex:
+        """Returns loaded index, rebuilds it from the file if it is stale.
+        In append only schema a row replaces the earlier rows of its ID"""
+        if not index.load():
+            index.reset()
+            for offset, row in scan_rows(file_name):
+                if "tombstone" in row and index.offset(row["id"]) is not None:
+                    index.discard(row)
+                    index.dead_rows += 1
+                if row.get("tombstone"):
+                    index.dead_rows += 1
+                else:
+                    index.put(row, offset)
+            index.save()
+        return index
+
+    def _get_user_index(self) -> StorageIndex:
+        """Returns users.csv index"""
+        return self._load_index(self._user_index, self._user_file)
+
+    def _get_movie_index(self) -> StorageIndex:
+        """Returns movies.csv index"""
+        return self._load_index(self._movie_index, self._movie_file)
+
+    def _read_movies_at(self, offsets) -> list[MovieRow]:
+        """Reads movie rows at given movies.csv byte offsets"""
+        with self._movie_lock:
+            return read_rows(self._movie_file, offsets, MovieRow)
+
+    def _read_user(self, user_id) -> UserRow | None:
+        """Reads only the user's row by its byte offset in users.csv"""
+        offset = self._get_user_index().offset(user_id)
+        if offset is None:
+            return None
+        rows = read_rows(self._user_file, [offset], UserRow)
+        return rows[0] if rows else None
+
+    def movies_dataframe(self):
+        """Returns movies.csv as pandas DataFrame for analysis. pandas is an
+        optional dependency and it is imported only when this is called"""
+        try:
+            import pandas as pd  # pylint: disable=import-outside-toplevel
+        except ImportError as import_er:
+            raise CsvStorageErrors(
+                "pandas has to be installed for movie analytics"
+            ) from import_er
+        return pd.DataFrame(
+            [movie.as_row() for movie in self._read_movie_file()], columns=MOVIE_FIELDS
+        )
 
     def initiate_user_file(self):
         """It writes default movies.csv file wirh its header"""
         with open(self._user_file, "w", encoding="utf-8") as initiated:
-            fieldnames = ["id", "name", "username", "email", "password", "movies"]
-            writer = csv.DictWriter(initiated, fieldnames=fieldnames)
+            writer = csv.DictWriter(initiated, fieldnames=USER_FIELDS)
             writer.writeheader()
 
-    def initiate_movie_file(self):
+    def initiate_movie_file(self, append_only: bool = False):
         """It writes default movies.csv file wirh its header"""
         with open(self._movie_file, "w", encoding="utf-8") as initiated:
-            fieldnames = ["id", "Title", "Year", "imdbRating", "Poster", "user_id"]
+            fieldnames = MOVIE_LOG_FIELDS if append_only else MOVIE_FIELDS
             writer = csv.DictWriter(initiated, fieldnames=fieldnames)
             writer.writeheader()
 
+    @synchronized
     def check_password(self, user_id, password) -> bool:
         """First find user by name
         Calls User Instance to use its verify password method"""
-        data = self._read_user_file().get("users")
-        user = data.get(str(user_id), None)
+        user = self._read_user(user_id)
         if user is not None:
-            return check_password_hash(user.get("password"), str(password))
+            return check_password_hash(user.password, str(password))
         return False
 
     def _write_user_file(self, data, mode):
         """data either could be dictinoary then mode="a" initiated or is a list
         with mode="w". single user data to add in existed file is in form and dictionary,
-        updated or changed info in users is in form of list of dictionaries
+        updated or changed info in users is in form of list of UserRow rows
         """
-        backup = self._read_user_file()
+        if mode == "w":
+            backup = list(self._read_user_file()["users"].values())
+        size_before = os.path.getsize(self._user_file)
+        index_is_fresh = self._user_index.load()
         try:
             with open(self._user_file, mode, encoding="utf-8", newline="") as csv_file:
-                fieldnames = ["id", "name", "username", "email", "password", "movies"]
-                writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+                writer = csv.DictWriter(csv_file, fieldnames=USER_FIELDS)
                 if csv_file.tell() == 0:
                     writer.writeheader()
+                csv_file.flush()
+                offset = os.fstat(csv_file.fileno()).st_size
                 if mode == "a":
                     row = {
                         "id": data.get("id"),
@@ -92,24 +272,41 @@ class CsvStorage(DMI):
                     }
                     writer.writerow(row)
                 elif mode == "w":
-                    writer.writerows(data)
+                    writer.writerows(user.as_row() for user in data)
         except Exception as write_user:
-            self._write_user_file(backup, mode="w")
+            self._user_index.reset()
+            if mode == "a":
+                os.truncate(self._user_file, size_before)
+            else:
+                self._write_user_file(backup, mode="w")
             raise CsvStorageErrors(
                 f"CSV write user error: {write_user}"
             ) from write_user
+        if mode == "a" and index_is_fresh:
+            self._user_index.put(row, offset)
+            self._user_index.append()
+        else:
+            # Rebuilt with offsets by the next lookup
+            self._user_index.reset()
 
     def _write_movie_file(self, data, mode):
         """Either add new movie (mode "a") in movies.csv or overwrite all CSV file with
         assigned new data witm (mode "w")"""
+        with self._movie_lock:
+            self._write_movie_rows(data, mode)
+
+    def _write_movie_rows(self, data, mode):
+        """Writes movie rows, appended row updates the index"""
+        index_is_fresh = self._movie_index.load()
         try:
             with open(
                 self._movie_file, mode, encoding="utf-8", newline=""
             ) as csv_write:
-                fieldnames = ["id", "Title", "Year", "imdbRating", "Poster", "user_id"]
-                writer = csv.DictWriter(csv_write, fieldnames=fieldnames)
+                writer = csv.DictWriter(csv_write, fieldnames=self._movie_fields)
                 if csv_write.tell() == 0:
                     writer.writeheader()
+                csv_write.flush()
+                offset = os.fstat(csv_write.fileno()).st_size
                 if mode == "a":
                     row = {
                         "id": data.get("id"),
@@ -119,101 +316,131 @@ class CsvStorage(DMI):
                         "Poster": data.get("Poster"),
                         "user_id": data.get("user_id"),
                     }
+                    if self._append_only:
+                        row["tombstone"] = data.get("tombstone", "")
                     writer.writerow(row)
                 else:
-                    writer.writerows(data)
+                    writer.writerows(movie.as_row() for movie in data)
         except Exception as movie_write:
+            self._movie_index.reset()
             raise CsvStorageErrors(f"Movie write error {movie_write}") from movie_write
+        if mode == "a" and index_is_fresh:
+            if self._movie_index.offset(row["id"]) is not None:
+                # Appended row replaces the earlier row of the movie
+                self._movie_index.discard(row)
+                self._movie_index.dead_rows += 1
+            if row.get("tombstone"):
+                self._movie_index.dead_rows += 1
+            else:
+                self._movie_index.put(row, offset)
+            self._movie_index.append()
+        else:
+            self._movie_index.reset()
 
     def _read_user_file(self):
         """
-        {id, name, username, email, password}
+        {"users": {id: UserRow}}
         """
         try:
             with open(self._user_file, "r", encoding="utf-8") as csv_file:
-                reader = csv.DictReader(csv_file)
+                reader = csv.reader(csv_file)
+                make_row = row_reader(UserRow, next(reader, USER_FIELDS))
                 data = {"version": 1.0, "users": {}}
                 for row in reader:
-                    # Maybe it will get from movies coloumn, try and see
-                    data["users"].update(
-                        {
-                            str(row["id"]): {
-                                "id": row["id"],
-                                "name": row["name"],
-                                "username": row["username"],
-                                "email": row["email"],
-                                "password": row["password"],
-                                "movies": row["movies"],
-                            }
-                        }
-                    )
+                    if row:
+                        user = make_row(row)
+                        data["users"][str(user.id)] = user
             return data
         except csv.Error as csv_error:
             raise CsvStorageErrors(
                 f"Error decoding csv file {self._user_file}: {csv_error}"
             ) from csv_error
 
-    def _read_movie_file(self) -> list:
-        """Loop through movies.csv file to extract movie info in dictionary form
-        and save them in list of dictionaries"""
-        movies = []
-        with open(self._movie_file, "r", encoding="utf-8") as read_csv:
-            reader = csv.DictReader(read_csv)
-
+    def _read_movie_file(self) -> list[MovieRow]:
+        """Loop through movies.csv file to extract movie rows in a list.
+        In append only schema only the latest row of every movie ID is kept
+        and tombstoned movies are left out"""
+        with self._movie_lock, open(
+            self._movie_file, "r", encoding="utf-8"
+        ) as read_csv:
+            reader = csv.reader(read_csv)
+            header = next(reader, MOVIE_FIELDS)
+            make_row = row_reader(MovieRow, header)
+            if not self._append_only:
+                return [make_row(row) for row in reader if row]
+            tombstone = header.index("tombstone")
+            movies = {}
             for row in reader:
-                movie = {
-                    "id": row["id"],
-                    "Title": row["Title"],
-                    "Year": row["Year"],
-                    "imdbRating": row["imdbRating"],
-                    "Poster": row["Poster"],
-                    "user_id": row["user_id"],
-                }
-                movies.append(movie)
-        return movies
+                if not row:
+                    continue
+                movie = make_row(row)
+                if tombstone < len(row) and row[tombstone]:
+                    movies.pop(movie.id, None)
+                else:
+                    movies[movie.id] = movie
+        return list(movies.values())
+
+    def compact_movie_file(self):
+        """Rewrites movies.csv with only the latest live row of every movie"""
+        with self._movie_lock:
+            movies = self._read_movie_file()
+            compacted = f"{self._movie_file}.compact"
+            with open(compacted, "w", encoding="utf-8", newline="") as csv_write:
+                writer = csv.DictWriter(csv_write, fieldnames=self._movie_fields)
+                writer.writeheader()
+                writer.writerows(movie.as_row() for movie in movies)
+            os.replace(compacted, self._movie_file)
+            self._movie_index.reset()
+            self._get_movie_index()
+
+    def _append_movie_change(self, row: dict):
+        """Appends an updated or tombstone movie row, starts background
+        compaction if movies.csv holds too many dead rows"""
+        self._write_movie_file(row, mode="a")
+        if self._movie_index.dead_rows >= self.COMPACT_AFTER:
+            threading.Thread(target=self.compact_movie_file, daemon=True).start()
 
     def add_movie_id_in_user_list(self, user_id):
-        """Opens csv file find user by ID, checks type of movie column
-        it is empty it gets None type then produces ID for movie writes movie ID in
+        """Reads users.csv rows, produces ID for movie and writes movie ID in
         user movie list"""
-        movies = self._read_movie_file()
-        with open(self._user_file, "r", encoding="utf-8") as read_csv:
-            reader = csv.DictReader(read_csv)
-            data = []
-            for row in reader:
-                if row["id"] == user_id:
-                    user_movies = row["movies"]
-                    if user_movies == "":
-                        user_movies = []
-                    else:
-                        user_movies = user_movies.split(",")
-                    movie_id = str(len(movies) + 1)
-                    user_movies.append(movie_id)
-                    movies_id_line = (",").join(user_movies)
-                    row["movies"] = movies_id_line
-                data.append(row)
+        users = self._read_user_file()["users"]
+        if str(user_id) not in users:
+            raise CsvStorageErrors("User ID is not valid")
+        movie_id = self._sequences.next_id("movies")
+        users[str(user_id)].movies.append(movie_id)
         # overwriting whole data mode="w"
-        self._write_user_file(data=data, mode="w")
+        self._write_user_file(data=list(users.values()), mode="w")
         return movie_id
 
-    def get_user_movies(self, user_id: int) -> list | None:
-        """Get all movies for given user"""
-        user = self.find_user(user_id=str(user_id))
-        if not user:
+    @request_snapshot
+    @synchronized
+    def get_user_movies(
+        self, user_id: int, after_id: int = None, limit: int = None
+    ) -> list | None:
+        """Get all movies for given user or a keyset page of them, reads
+        only the user's rows by their byte offsets in movies.csv"""
+        if self._read_user(user_id) is None:
             raise CsvStorageErrors("User ID is not valid")
-        movies = self._read_movie_file()
-        user_movies = []
-        for movie in movies:
-            if movie.get("user_id") == str(user_id):
-                user_movies.append(movie)
-        return user_movies
-
+        with self._movie_lock:
+            offsets = self._get_movie_index().get_group("user_id", user_id)
+            movies = self._read_movies_at(offsets)
+        # Updated rows of append only schema are further in the file
+        return self.keyset_page(movies, after_id, limit)
+
+    @changes_snapshot
+    @synchronized
     def add_movie_in_user_list(self, userdata):
         """Operates movies.csv file to create line of movi info: movie_id primary key
-        and user_id foreign key to connect with users.csv"""
+        and user_id foreign key to connect with users.csv. In append only schema
+        users.csv movies column is not kept, user_id is the only relationship"""
         movie = userdata.get("movie")
         user_id = str(userdata.get("id"))
-        movie_id = self.add_movie_id_in_user_list(user_id=user_id)
+        if not self._append_only:
+            movie_id = self.add_movie_id_in_user_list(user_id=user_id)
+        elif self._read_user(user_id) is not None:
+            movie_id = self._sequences.next_id("movies")
+        else:
+            return False, "User ID is not valid to add new movie to the list."
         movie["id"] = movie_id
         movie["user_id"] = user_id
         try:
@@ -222,25 +449,43 @@ class CsvStorage(DMI):
         except CsvStorageErrors as add_movie:
             return False, f"{add_movie}"
 
-    def get_all_users(self) -> list:
-        """Get all users as a list from storage"""
+    @request_snapshot
+    @synchronized
+    def get_all_users(
+        self, after_id: int = None, limit: int = None, after_name: str = None
+    ) -> list:
+        """Get all users as a list from storage, or a keyset page of them
+        by ID, after_name is not needed for it"""
         data = self._read_user_file()
         users = data.get("users", {}).values()
-        return list(users)
+        return self.keyset_page(users, after_id, limit)
 
+    @request_snapshot
+    @synchronized
     def get_target_movie(self, user_id: int, movie_id: int) -> dict | None:
-        """Get the target movie from a user's list."""
-        movies = self.get_user_movies(str(user_id))
-        if not movies:
-            return None
-        target_movie = next(
-            (movie for movie in movies if movie["id"] == str(movie_id)), None
-        )
-        return target_movie
+        """Get the target movie from a user's list by its byte offset."""
+        return self._target_movie(user_id, movie_id)
 
-    def find_user(self, username: str = None, user_id: int = None) -> User | None:
-        """Find user by either name or user ID info then
-        extract a user form list of dictionaries by given name
+    def _target_movie(self, user_id, movie_id) -> MovieRow | None:
+        """Reads the user's movie row, for methods changing it"""
+        if self._read_user(user_id) is None:
+            raise CsvStorageErrors("User ID is not valid")
+        with self._movie_lock:
+            offset = self._get_movie_index().offset(movie_id)
+            if offset is None:
+                return None
+            movies = self._read_movies_at([offset])
+        if not movies or movies[0].user_id != int(user_id):
+            return None
+        return movies[0]
+
+    @request_snapshot
+    @synchronized
+    def find_user(
+        self, username: str = None, user_id: int = None, email: str = None
+    ) -> User | None:
+        """Find user by either name, user ID or email info then
+        get user ID of given name or email from users.csv index
         extract a user from dictionary by given user ID
         and returns user info as dict
 
@@ -251,26 +496,61 @@ class CsvStorage(DMI):
             obj | None: user object
         """
         user_id = str(user_id) if user_id is not None else None
-        users = self._read_user_file().get("users")
-        user_list = self.get_all_users()
-        if user_id is not None and len(users) > 0:
-            user = users.get(user_id)
-        elif username is not None and len(user_list) > 0:
-            user = next(
-                (user for user in user_list if user.get("username") == username),
-                None,
-            )
-        else:
-            user = None
+        if user_id is None and username is not None:
+            user_id = self._get_user_index().get("username", username)
+        elif user_id is None and email is not None:
+            user_id = self._get_user_index().get("email", email)
+        if user_id is None:
+            return None
+        user = self._read_user(user_id)
         if user is not None:
-            return User(user)
+            return User(user.as_row())
         return None
 
+    @synchronized
+    def find_users(self, user_ids) -> dict:
+        """{user ID: user} of the given IDs, their rows are read by byte
+        offset in one pass over users.csv"""
+        index = self._get_user_index()
+        offsets = {index.offset(user_id) for user_id in user_ids} - {None}
+        rows = read_rows(self._user_file, sorted(offsets), UserRow)
+        return {row.id: User(row.as_row()) for row in rows}
+
+    @synchronized
+    def get_movies_for_users(self, user_ids) -> dict:
+        """{user ID: movies} of the given IDs, rows of all given users are
+        read by byte offset in one pass over movies.csv"""
+        movies = {int(user_id): [] for user_id in user_ids}
+        with self._movie_lock:
+            index = self._get_movie_index()
+            offsets = set()
+            for user_id in movies:
+                offsets.update(index.get_group("user_id", user_id))
+            rows = self._read_movies_at(sorted(offsets))
+        for row in rows:
+            movies[row.user_id].append(row)
+        return {
+            user_id: self.keyset_page(user_movies)
+            for user_id, user_movies in movies.items()
+        }
+
+    @synchronized
+    def get_movies(self, user_id, movie_ids) -> dict:
+        """{movie ID: movie} of the given IDs in the user's list, read by
+        byte offset in one pass over movies.csv"""
+        with self._movie_lock:
+            index = self._get_movie_index()
+            offsets = {index.offset(movie_id) for movie_id in movie_ids} - {None}
+            rows = self._read_movies_at(sorted(offsets))
+        return {row.id: row for row in rows if row.user_id == int(user_id)}
+
+    @changes_snapshot
+    @synchronized
     def add_new_user(self, userdata: dict) -> None | CsvStorageErrors:
         """Creates a new user in users dictionary, checks if the name does exist"""
         try:
-            user = self.find_user(username=userdata.get("username"))
-            if user is not None:
+            username = userdata.get("username").strip()
+            if self._get_user_index().get("username", username) is not None:
                 raise CsvStorageErrors("username exists, choose different one")
             user = User(userdata=userdata)
             user.password = userdata.get("password")
@@ -281,6 +561,8 @@ class CsvStorage(DMI):
             raise CsvStorageErrors(f"Adding new user error: {err}") from err
         self._write_user_file(userdata, mode="a")
 
+    @changes_snapshot
+    @synchronized
     def update_user_info(self, user_id, form: dict):
         """Update user info in saved JSON file"""
         userdata = {
@@ -296,13 +578,15 @@ class CsvStorage(DMI):
         users = list(data["users"].values())
         updated_user_list = []
         for user in users:
-            if user.get("id") == str(user_id):
-                user["name"] = userdata.get("name")
-                user["username"] = userdata.get("username")
-                user["email"] = userdata.get("email")
+            if user.id == int(user_id):
+                user.name = userdata.get("name")
+                user.username = userdata.get("username")
+                user.email = userdata.get("email")
             updated_user_list.append(user)
         self._write_user_file(updated_user_list, mode="w")
 
+    @changes_snapshot
+    @synchronized
     def delete_user_info(self, user_id, form):
         """Update user in user.csv"""
         userdata = {"password": form.password.data.strip()}
@@ -312,46 +596,68 @@ class CsvStorage(DMI):
         users = list(data["users"].values())
         new_user_list = []
         for user in users:
-            if user.get("id") != str(user_id):
+            if user.id != int(user_id):
                 new_user_list.append(user)
         self._write_user_file(new_user_list, mode="w")
 
+    @changes_snapshot
+    @synchronized
     def update_movie_in_user_list(self, _, movie_id, form):
-        """Update a movie from a movies' list."""
+        """Update a movie from a movies' list. In append only schema updated
+        row is appended instead of rewriting movies.csv"""
+        if self._append_only:
+            with self._movie_lock:
+                offset = self._get_movie_index().offset(movie_id)
+                if offset is None:
+                    raise CsvStorageErrors("Movie ID is not valid")
+                movie = self._read_movies_at([offset])[0]
+                movie.Title = form.title.data.title().strip()
+                movie.Year = form.year.data.strip()
+                movie.imdbRating = form.rate.data
+                self._append_movie_change(movie.as_row())
+            return
         movies = self._read_movie_file()
         updated_movie_list = []
         for movie in movies:
-            if str(movie_id) == movie.get("id"):
-                movie["Title"] = form.title.data.title().strip()
-                movie["Year"] = form.year.data.strip()
-                movie["imdbRating"] = form.rate.data
+            if movie.id == int(movie_id):
+                movie.Title = form.title.data.title().strip()
+                movie.Year = form.year.data.strip()
+                movie.imdbRating = form.rate.data
             updated_movie_list.append(movie)
         self._write_movie_file(updated_movie_list, mode="w")
 
+    @changes_snapshot
+    @synchronized
     def delete_movie_in_user_list(self, user_id: int, movie_id: int):
         """Delete movie ID from user movies columns"""
         data = self._read_user_file()
         users = list(data["users"].values())
         new_user_list = []
         for user in users:
-            if str(user_id) == user.get("id"):
-                user_movies = user.get("movies")
-                if user_movies == "":
+            if user.id == int(user_id):
+                if not user.movies:
                     raise CsvStorageErrors("User movie list is empty")
-                movie_list = user_movies.split(",")
-                movie_index = movie_list.index(str(movie_id))
-                movie_list.pop(movie_index)
-                new_movie_line = (",").join(movie_list)
-                user["movies"] = new_movie_line
+                user.movies.remove(int(movie_id))
             new_user_list.append(user)
         self._write_user_file(new_user_list, mode="w")
 
+    @changes_snapshot
+    @synchronized
     def delete_movie_from_user_list(self, user_id: int, movie_id: int) -> str:
-        """Delete a movie from a user's as its ID and also from movie list."""
+        """Delete a movie from a user's as its ID and also from movie list.
+        In append only schema a tombstone row is appended to movies.csv"""
+        if self._append_only:
+            with self._movie_lock:
+                movie = self._target_movie(user_id, movie_id)
+                if movie is None:
+                    raise CsvStorageErrors("Movie ID is not valid")
+                tombstone = {"id": movie.id, "user_id": movie.user_id}
+                self._append_movie_change({**tombstone, "tombstone": "1"})
+            return f"{movie.Title} deleted."
         movies = self._read_movie_file()
         new_movie_list = []
         for movie in movies:
-            if movie.get("id") != str(movie_id):
+            if movie.id != int(movie_id):
                 new_movie_list.append(movie)
         self._write_movie_file(new_movie_list, mode="w")
         self.delete_movie_in_user_list(user_id, movie_id)
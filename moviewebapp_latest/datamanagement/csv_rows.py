@@ -0,0 +1,119 @@
+"""Typed rows of CSV storage files.
+Columns of a read row are converted once, IDs to int and rating to float, so
+lookups compare integers instead of re-stringified text and a row does not keep
+a dictionary of its own"""
+
+
+def to_int(value) -> int | None:
+    """Converts ID column text to int, empty column is None"""
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def to_float(value) -> float | str | None:
+    """Converts rating column text to float, text which is not a number
+    (OMDb gives "N/A") is kept as it is"""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class UserRow:
+    """users.csv row, movies column is kept as a list of movie IDs"""
+
+    __slots__ = ("id", "name", "username", "email", "password", "movies")
+
+    def __init__(self, values: list) -> None:
+        """values are column texts in __slots__ order"""
+        self.id = to_int(values[0])
+        self.name = values[1]
+        self.username = values[2]
+        self.email = values[3]
+        self.password = values[4]
+        self.movies = [int(movie_id) for movie_id in values[5].split(",") if movie_id]
+
+    def __getitem__(self, field: str):
+        return getattr(self, field)
+
+    def get(self, field: str, default=None):
+        """Dictionary like access for code reading rows as dictionaries"""
+        return getattr(self, field, default)
+
+    def as_row(self) -> dict:
+        """Column values to write the row back to users.csv"""
+        row = {field: getattr(self, field) for field in self.__slots__}
+        row["movies"] = ",".join(str(movie_id) for movie_id in self.movies)
+        return row
+
+    def __repr__(self):
+        return f"UserRow({self.as_row()})"
+
+    def to_dict(self) -> dict:
+        """Returns dict representation of the user like sqlite User"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "username": self.username,
+            "email": self.email,
+        }
+
+
+class MovieRow:
+    """movies.csv row"""
+
+    __slots__ = ("id", "Title", "Year", "imdbRating", "Poster", "user_id")
+
+    def __init__(self, values: list) -> None:
+        """values are column texts in __slots__ order"""
+        self.id = to_int(values[0])
+        self.Title = values[1]
+        self.Year = values[2]
+        self.imdbRating = to_float(values[3])
+        self.Poster = values[4]
+        self.user_id = to_int(values[5])
+
+    def __getitem__(self, field: str):
+        return getattr(self, field)
+
+    def get(self, field: str, default=None):
+        """Dictionary like access for code reading rows as dictionaries"""
+        return getattr(self, field, default)
+
+    def as_row(self) -> dict:
+        """Column values to write the row back to movies.csv"""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"MovieRow({self.as_row()})"
+
+    def to_dict(self) -> dict:
+        """Dictionary representation like sqlite Movie"""
+        return {
+            "id": self.id,
+            "Title": self.Title,
+            "Year": self.Year,
+            "Rate": self.imdbRating,
+        }
+
+
+def row_reader(row_type, header: list):
+    """Returns a function making row_type rows out of csv.reader rows of a
+    file with given header, columns are picked by name so extra columns
+    (tombstone) and a different column order do not matter"""
+    positions = [
+        header.index(field) if field in header else None for field in row_type.__slots__
+    ]
+
+    def make_row(row: list):
+        return row_type(
+            [
+                row[position] if position is not None and position < len(row) else ""
+                for position in positions
+            ]
+        )
+
+    return make_row
@@ -1,11 +1,44 @@
 """This module is used to store movies in a json file."""
 
 import json
+import threading
 from werkzeug.security import check_password_hash
-from datamanagement.storage_inheritance import os, DataManagmentInterface as DMI
+from datamanagement.storage_inheritance import (
+    os,
+    changes_snapshot,
+    request_snapshot,
+    synchronized,
+    DataManagmentInterface as DMI,
+)
+from datamanagement.storage_index import StorageIndex, file_stamp
 from user.user_instance import User
 
 
+# Version 2.0 keeps user movies in {movie_id: movie} dictionaries, version 3.0
+# adds "sequences" header holding the last given user and movie IDs
+VERSION = 3.0
+
+
+def movies_by_id(movies: list | dict) -> dict:
+    """Converts version 1.0 list of movies in {movie_id: movie} dictionary,
+    movies sharing an ID with a previous one get the next free ID"""
+    if isinstance(movies, dict):
+        return movies
+    next_id = max((int(movie["id"]) for movie in movies), default=0) + 1
+    upgraded = {}
+    for movie in movies:
+        if str(movie["id"]) in upgraded:
+            movie["id"] = next_id
+            next_id += 1
+        upgraded[str(movie["id"])] = movie
+    return upgraded
+
+
+def last_movie_id(movies: dict) -> int:
+    """Highest movie ID in {movie_id: movie} dictionary"""
+    return max((int(movie_id) for movie_id in movies), default=0)
+
+
 class JsonStorageErrors(Exception):
     """JsonStorageErrors is a class for raising errors."""
 
@@ -14,35 +47,219 @@ class JsonStorageErrors(Exception):
 
 
 class JsonStorage(DMI):
-    """Class for storing movies in a JSON file."""
+    """Class for storing movies in a JSON file.
+    In journal mode changes are appended to movies.json.journal as one line
+    records and folded into movies.json once the journal gets long. Journal
+    starts with the "journal" number of the JSON file it was written against,
+    a journal already folded into the file has an older number and is skipped"""
 
-    def __init__(self, filename) -> None:
+    # Journal records kept before they are compacted into the JSON file
+    COMPACT_AFTER = 500
+    # JSON file path -> lock shared by storages working on the same file
+    _file_locks = {}
+    # File path -> writes made to it in this process. Files are rewritten in
+    # place, so a same size rewrite within one mtime tick keeps the inode,
+    # mtime and size; the count still tells other storages it changed
+    _generations = {}
+
+    def __init__(self, filename, journal: bool = False) -> None:
         if not os.path.exists(DMI.logs_dir):
             os.makedirs(DMI.logs_dir)
         file_name = os.path.join(DMI.logs_dir, f"{filename}.json")
         if not os.path.exists(file_name):
             with open(file_name, "w", encoding="utf-8") as initiate:
-                json.dump({"version": 1.0, "users": {}}, initiate, indent=4)
+                initial = {
+                    "version": VERSION,
+                    "sequences": {"users": 0, "movies": 0},
+                    "users": {},
+                }
+                json.dump(initial, initiate, indent=4)
         self._filename = file_name
+        # Public methods read and change the in-memory copy under this lock
+        self._lock = JsonStorage._file_locks.setdefault(file_name, threading.RLock())
+        self._journal = journal
+        self._journal_file = f"{file_name}.journal"
+        self._journal_records = 0
+        # Parsed copy of the files and the stamp they were read at
+        self._cache = None
+        self._cache_stamp = None
+        # username -> id and email -> id maps saved in movies.json.index
+        self._index = StorageIndex(file_name, ("username", "email"))
+
+    @staticmethod
+    def _path_stamp(path) -> tuple:
+        """Write count of the file in this process and its file_stamp"""
+        return JsonStorage._generations.get(path, 0), file_stamp(path)
+
+    @staticmethod
+    def _written(path) -> None:
+        """Counts a write made to the file"""
+        JsonStorage._generations[path] = JsonStorage._generations.get(path, 0) + 1
+
+    def _file_stamp(self) -> tuple:
+        """Returns stamps of the JSON file and its journal"""
+        return self._path_stamp(self._filename) + self._path_stamp(self._journal_file)
 
     def _read_file(self):
-        """Reads data from the JSON file and returns a dictionary."""
+        """Returns the parsed JSON file with journal records applied on it as
+        a dictionary. Parsed data is kept in memory and files are parsed again
+        only if their stamp changed since the last read or write."""
+        stamp = self._file_stamp()
+        if self._cache is not None and stamp == self._cache_stamp:
+            return self._cache
         try:
             with open(self._filename, "r", encoding="utf-8") as json_file:
                 data = json.load(json_file)
-            return data
         except json.decoder.JSONDecodeError as jdecoder:
             raise JsonStorageErrors(
                 f"Error decoding json file {self._filename}:\n\t--> {jdecoder}"
             ) from jdecoder
+        self._index.reset()
+        if not self._index.load():
+            self._index.rebuild(data.get("users", {}).values())
+        # Files converted to sharded layout before it wrote the header
+        # have a current version but no sequences
+        if data.get("version", 1.0) < VERSION or "sequences" not in data:
+            self._upgrade(data)
+        self._replay_journal(data)
+        self._cache = data
+        self._cache_stamp = stamp
+        return data
+
+    def _upgrade(self, data) -> None:
+        """Keys movies of older files by their ID and adds ID sequences header
+        from the highest IDs in the file, upgraded data is saved with the
+        next write"""
+        last_ids = {"users": 0, "movies": 0}
+        for user_id, user in data["users"].items():
+            last_ids["users"] = max(last_ids["users"], int(user_id))
+            if "movies" in user:
+                user["movies"] = movies_by_id(user["movies"])
+                last_ids["movies"] = max(
+                    last_ids["movies"], last_movie_id(user["movies"])
+                )
+        data.setdefault("sequences", last_ids)
+        data["version"] = VERSION
+
+    def _replay_journal(self, data) -> None:
+        """Applies change records saved in the journal on the parsed JSON file"""
+        self._journal_records = 0
+        if not os.path.exists(self._journal_file):
+            return
+        with open(self._journal_file, "r", encoding="utf-8") as journal:
+            try:
+                begin = json.loads(journal.readline())
+            except json.decoder.JSONDecodeError:
+                begin = {}
+            if begin.get("journal") != data.get("journal", 0):
+                # Journal was folded into the file but not removed
+                journal.close()
+                os.remove(self._journal_file)
+                return
+            for line in journal:
+                try:
+                    change = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    # Last record may be cut short by an interrupted append
+                    break
+                self._apply_change(data, change)
+                self._journal_records += 1
 
     def _write_file(self, data):
         """Writes data to file expected structure is:
-        {"version": version, "users": {id: {"user":user_object , "movies":{id:movie_}}}
+        {"version": version, "users": {id: {**user_record , "movies":{id:movie_}}}
+        Written data becomes the in-memory copy for following reads and
+        journal records folded into it are removed.
         """
-        with open(self._filename, "w", encoding="utf-8") as handle:
-            json.dump(data, handle, indent=4)
+        try:
+            if os.path.exists(self._journal_file):
+                data["journal"] = data.get("journal", 0) + 1
+            with open(self._filename, "w", encoding="utf-8") as handle:
+                json.dump(data, handle, indent=4)
+            if os.path.exists(self._journal_file):
+                os.remove(self._journal_file)
+            self._journal_records = 0
+        except Exception:
+            # In-memory copy may hold changes which did not reach the file
+            self._cache = None
+            self._index.reset()
+            raise
+        finally:
+            self._written(self._filename)
+            self._written(self._journal_file)
+        self._cache = data
+        self._cache_stamp = self._file_stamp()
+        self._index.save()
+
+    def _append_journal(self, data, change: dict) -> None:
+        """Appends a change record as a compact line to the journal file"""
+        try:
+            with open(self._journal_file, "a", encoding="utf-8") as journal:
+                if journal.tell() == 0:
+                    begin = {"op": "begin", "journal": data.get("journal", 0)}
+                    journal.write(json.dumps(begin) + "\n")
+                journal.write(json.dumps(change, separators=(",", ":")) + "\n")
+        except Exception:
+            self._cache = None
+            self._index.reset()
+            raise
+        finally:
+            self._written(self._journal_file)
+        self._journal_records += 1
+        self._cache_stamp = self._file_stamp()
+
+    def _apply_change(self, data, change: dict) -> None:
+        """Applies a change record on the parsed data and keeps the index
+        in step"""
+        users = data["users"]
+        sequences = data["sequences"]
+        operation = change["op"]
+        if operation == "add_user":
+            user = change["user"]
+            sequences["users"] = max(sequences["users"], int(user["id"]))
+            if str(user["id"]) in users:
+                self._index.discard(users[str(user["id"])])
+            users[str(user["id"])] = user
+            self._index.put(user)
+        elif operation == "set_user":
+            user = users.get(change["id"])
+            if user is not None:
+                self._index.discard(user)
+                user.update(change["fields"])
+                self._index.put(user)
+        elif operation == "del_user":
+            user = users.pop(change["id"], None)
+            if user is not None:
+                self._index.discard(user)
+        elif change["user_id"] in users:
+            movies = users[change["user_id"]]["movies"]
+            if operation == "add_movie":
+                movie_id = int(change["movie"]["id"])
+                movies[str(movie_id)] = change["movie"]
+                sequences["movies"] = max(sequences["movies"], movie_id)
+            elif operation == "set_movie" and str(change["id"]) in movies:
+                movies[str(change["id"])].update(change["fields"])
+            elif operation == "del_movie":
+                movies.pop(str(change["id"]), None)
 
+    def _commit(self, change: dict) -> None:
+        """Applies change on the in-memory data then either appends it to the
+        journal or writes the whole JSON file"""
+        data = self._read_file()
+        self._apply_change(data, change)
+        if not self._journal:
+            self._write_file(data)
+            return
+        self._append_journal(data, change)
+        if self._journal_records >= self.COMPACT_AFTER:
+            self.compact()
+
+    @synchronized
+    def compact(self) -> None:
+        """Folds journal records into the JSON file and empties the journal"""
+        self._write_file(self._read_file())
+
+    @synchronized
     def check_password(self, user_id, password) -> bool:
         """First find user by name
         Calls User Instance to use its verify password method"""
@@ -52,9 +269,13 @@ class JsonStorage(DMI):
             return check_password_hash(user.get("password"), password)
         return False
 
-    def find_user(self, username: str = None, user_id: int = None) -> User | None:
-        """Find user by either name or user ID info then
-        extract a user form list of dictionaries by given name
+    @request_snapshot
+    @synchronized
+    def find_user(
+        self, username: str = None, user_id: int = None, email: str = None
+    ) -> User | None:
+        """Find user by either name, user ID or email info then
+        get user ID of given name or email from the index
         extract a user from dictionary by given user ID
         and returns user info as dict
 
@@ -66,20 +287,20 @@ class JsonStorage(DMI):
         """
         user_id = str(user_id) if user_id is not None else None
         users = self._read_file().get("users")
-        user_list = self.get_all_users()
+        if user_id is None and username is not None:
+            user_id = self._index.get("username", username)
+        elif user_id is None and email is not None:
+            user_id = self._index.get("email", email)
         if user_id is not None:
             user = users.get(user_id)
-        elif username is not None:
-            user = next(
-                (user for user in user_list if user.get("username") == username),
-                None,
-            )
         else:
             user = None
         if user is not None:
             return User(userdata=user)
         return None
 
+    @changes_snapshot
+    @synchronized
     def update_user_info(self, user_id, form: dict):
         """Update user info in saved JSON file"""
         userdata = {
@@ -90,52 +311,93 @@ class JsonStorage(DMI):
         }
         if not self.check_password(user_id=user_id, password=userdata.get("password")):
             raise JsonStorageErrors("Invalid Password")
-        # Getting userdata as user instance
-        data = self._read_file()
-        user = data["users"].get(str(user_id))
-        user["name"] = userdata.get("name", userdata.get("name"))
-        user["username"] = userdata.get("username", userdata.get("username"))
-        user["email"] = userdata.get("email", userdata.get("email"))
-        self._write_file(data)
+        fields = {
+            "name": userdata.get("name"),
+            "username": userdata.get("username"),
+            "email": userdata.get("email"),
+        }
+        self._commit({"op": "set_user", "id": str(user_id), "fields": fields})
 
+    @changes_snapshot
+    @synchronized
     def delete_user_info(self, user_id, form):
         """Update user infor with OREM"""
         userdata = {"password": form.password.data.strip()}
         if not self.check_password(user_id=user_id, password=userdata["password"]):
             raise JsonStorageErrors("Invalid Password")
-        data = self._read_file()
-        del data["users"][str(user_id)]
-        self._write_file(data)
+        self._commit({"op": "del_user", "id": str(user_id)})
 
-    def get_all_users(self):
-        """returns storage saved user records"""
+    @request_snapshot
+    @synchronized
+    def get_all_users(
+        self, after_id: int = None, limit: int = None, after_name: str = None
+    ):
+        """returns storage saved user records, keyset page of them by ID
+        if after_id or limit is given, after_name is not needed for it"""
         users = self._read_file().get("users", None)
         if users is None:
-            users = []
-        return list(users.values())
+            users = {}
+        return self.keyset_page(users.values(), after_id, limit)
 
-    def get_user_movies(self, user_id: int) -> list | None:
-        """Get all movies for given user"""
+    @request_snapshot
+    @synchronized
+    def get_user_movies(
+        self, user_id: int, after_id: int = None, limit: int = None
+    ) -> list | None:
+        """Get all movies for given user, or a keyset page of them"""
         data = self._read_file()
         user = data["users"].get(str(user_id))
         if not user:
             raise JsonStorageErrors("User ID is not valid")
-        return user.get("movies")
+        return self.keyset_page(user.get("movies").values(), after_id, limit)
+
+    @synchronized
+    def find_users(self, user_ids) -> dict:
+        """{user ID: user} of the given IDs from a single read of the file"""
+        users = self._read_file()["users"]
+        return {
+            int(user_id): User(userdata=users[str(user_id)])
+            for user_id in user_ids
+            if str(user_id) in users
+        }
+
+    @synchronized
+    def get_movies_for_users(self, user_ids) -> dict:
+        """{user ID: movies} of the given IDs, sharded storage reads the
+        shard of every given user"""
+        users = self._read_file()["users"]
+        return {
+            int(user_id): (
+                self.keyset_page(self._user_movies(user_id).values())
+                if str(user_id) in users
+                else []
+            )
+            for user_id in user_ids
+        }
+
+    @synchronized
+    def get_movies(self, user_id, movie_ids) -> dict:
+        """{movie ID: movie} of the given IDs in the user's movies"""
+        movies = self._user_movies(user_id)
+        return {
+            int(movie_id): movies[str(movie_id)]
+            for movie_id in movie_ids
+            if str(movie_id) in movies
+        }
 
     def user_unique_id(self, username) -> int | Exception:
-        """Iterate through users dictionary to find
-        max key of movie and generate max + 1
-        if name already exist raise JsonStorageErrors"""
+        """Returns next ID of users sequence, IDs of deleted users are not
+        given again. If name already exist in the index raise JsonStorageErrors"""
         username = username.strip()
         data = self._read_file()
-        users = data.get("users")
-        for user in users.values():
-            if username == user.get("username"):
-                raise JsonStorageErrors(
-                    "JsonStorage: User name is already in json movie database"
-                )
-        return max((int(key) for key in users.keys()), default=0) + 1
+        if self._index.get("username", username) is not None:
+            raise JsonStorageErrors(
+                "JsonStorage: User name is already in json movie database"
+            )
+        return data["sequences"]["users"] + 1
 
+    @changes_snapshot
+    @synchronized
     def add_new_user(self, userdata: dict) -> None | JsonStorageErrors:
         """Creates a new user in users dictionary, checks if the name does exist"""
         try:
@@ -144,25 +406,25 @@ class JsonStorage(DMI):
             user_id = user_with_id.get("id")
             userdata["id"] = user_id
             user.password = userdata.get("password")
-            data = self._read_file()
-            data["users"][str(user_id)] = {
+            record = {
                 "id": userdata.get("id"),
                 "name": userdata.get("name"),
                 "username": userdata.get("username"),
                 "email": userdata.get("email"),
                 "password": user.password_hash,
-                "movies": [],
+                "movies": {},
             }
         except Exception as err:
             raise JsonStorageErrors(f"Adding new user error: {err}") from err
-        self._write_file(data)
+        self._commit({"op": "add_user", "user": record})
 
     def movie_unique_id(self, user_id) -> int:
-        """Create ID for movie according length of list of movies"""
-        users = self._read_file().get("users")
-        movies = users.get(user_id).get("movies")
-        return len(movies) + 1
+        """Returns next ID of movies sequence, IDs of deleted movies are not
+        given again"""
+        return self._read_file()["sequences"]["movies"] + 1
 
+    @changes_snapshot
+    @synchronized
     def add_movie_in_user_list(self, userdata) -> tuple[bool, str]:
         """Add a movie to a user's list."""
         data = self._read_file()
@@ -172,45 +434,223 @@ class JsonStorage(DMI):
         new_movie["id"] = movie_id
 
         if user_id in data["users"]:
-            data["users"][user_id]["movies"].append(new_movie)
-            self._write_file(data)
+            self._commit({"op": "add_movie", "user_id": user_id, "movie": new_movie})
             return True, "New Movie Added Successfully"
         return (
             False,
             "User ID is not valid to add new movie to the list.",
         )
 
+    def _user_movies(self, user_id) -> dict:
+        """Returns {movie_id: movie} dictionary of the user"""
+        user = self._read_file()["users"].get(str(user_id))
+        if not user:
+            raise JsonStorageErrors("User ID is not valid")
+        return user.get("movies")
+
+    @request_snapshot
+    @synchronized
     def get_target_movie(self, user_id: int, movie_id: int) -> dict | JsonStorageErrors:
-        """Get the target movie from a user's list."""
-        movies = self.get_user_movies(user_id)
-        if not movies:
-            return None
-        target_movie = next(
-            (movie for movie in movies if movie["id"] == movie_id), None
-        )
-        if not target_movie:
-            return None
-        return target_movie
+        """Get the target movie from a user's movies by its ID."""
+        return self._target_movie(user_id, movie_id)
+
+    def _target_movie(self, user_id, movie_id) -> dict | None:
+        """Movie dictionary in the in-memory data, for methods changing it"""
+        return self._user_movies(user_id).get(str(movie_id))
 
+    @changes_snapshot
+    @synchronized
     def update_movie_in_user_list(self, user_id, movie_id, form):
         """Update a movie from a user's list."""
-        data = self._read_file()
-        target_movie = self.get_target_movie(user_id, movie_id)
-        movie_index = data["users"].get(str(user_id)).get("movies").index(target_movie)
-        target_movie = {
+        if self._target_movie(user_id, movie_id) is None:
+            raise JsonStorageErrors("Movie ID is not valid")
+        fields = {
             "Title": form.title.data.title().strip(),
             "Year": form.year.data,
             "imdbRating": form.rate.data,
         }
-        data["users"].get(str(user_id)).get("movies")[movie_index].update(target_movie)
-        self._write_file(data)
+        self._commit(
+            {"op": "set_movie", "user_id": str(user_id), "id": movie_id, "fields": fields}
+        )
 
+    @changes_snapshot
+    @synchronized
     def delete_movie_from_user_list(self, user_id: int, movie_id: int) -> str:
         """Delete a movie from a user's list."""
-        data = self._read_file()
-        target_movie = self.get_target_movie(user_id, movie_id)
-        deleted_movie = data["users"][str(user_id)]["movies"].pop(
-            data["users"][str(user_id)]["movies"].index(target_movie)
+        deleted_movie = self._target_movie(user_id, movie_id)
+        if deleted_movie is None:
+            raise JsonStorageErrors("Movie ID is not valid")
+        self._commit({"op": "del_movie", "user_id": str(user_id), "id": movie_id})
+        return f"{deleted_movie.get('Title')} deleted."
+
+
+class ShardedJsonStorage(JsonStorage):
+    """JSON storage split in files under data/movies_shards. directory.json
+    keeps user records without movies and every user's movie list is saved
+    in its own <user_id>.json shard, so movie methods touch only one shard"""
+
+    def __init__(self, filename, journal: bool = False) -> None:
+        shard_dir = os.path.join(DMI.logs_dir, f"{filename}_shards")
+        if not os.path.exists(shard_dir):
+            os.makedirs(shard_dir)
+        self._shard_dir = shard_dir
+        # user_id -> (shard file stamp, parsed shard)
+        self._shards = {}
+        super().__init__(os.path.join(f"{filename}_shards", "directory"), journal)
+
+    @classmethod
+    def convert_single_file(cls, filename, journal: bool = False):
+        """Splits single file JSON storage of given name into a directory file
+        and per user shard files, returns the sharded storage"""
+        data = JsonStorage(filename)._read_file()
+        sharded = cls(filename, journal=journal)
+        if sharded.get_all_users():
+            raise JsonStorageErrors(
+                f"Sharded storage {sharded._shard_dir} already has users"
+            )
+        directory = {
+            "version": VERSION,
+            "sequences": dict(data["sequences"]),
+            "users": {},
+        }
+        for user_id, user in data["users"].items():
+            directory["users"][user_id] = {
+                key: value for key, value in user.items() if key != "movies"
+            }
+            movies = user.get("movies", {})
+            # Single file movies sequence is not given again after deletes
+            last_id = max(last_movie_id(movies), data["sequences"]["movies"])
+            shard = {
+                "version": VERSION,
+                "sequences": {"movies": last_id},
+                "movies": movies,
+            }
+            sharded._write_shard(user_id, shard)
+        sharded._write_file(directory)
+        sharded._index.rebuild(directory["users"].values())
+        return sharded
+
+    def _shard_file(self, user_id) -> str:
+        """Path of the user's shard file"""
+        return os.path.join(self._shard_dir, f"{user_id}.json")
+
+    def _read_shard(self, user_id) -> dict:
+        """Returns parsed shard of the user, parsed shards are kept in memory
+        until the shard file's stamp changes"""
+        shard_file = self._shard_file(user_id)
+        if not os.path.exists(shard_file):
+            return {"version": VERSION, "sequences": {"movies": 0}, "movies": {}}
+        stamp = self._path_stamp(shard_file)
+        cached = self._shards.get(str(user_id))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            with open(shard_file, "r", encoding="utf-8") as json_file:
+                shard = json.load(json_file)
+        except json.decoder.JSONDecodeError as jdecoder:
+            raise JsonStorageErrors(
+                f"Error decoding json file {shard_file}:\n\t--> {jdecoder}"
+            ) from jdecoder
+        if shard.get("version", 1.0) < VERSION:
+            shard["movies"] = movies_by_id(shard["movies"])
+            shard.setdefault("sequences", {"movies": last_movie_id(shard["movies"])})
+            shard["version"] = VERSION
+        self._shards[str(user_id)] = (stamp, shard)
+        return shard
+
+    def _write_shard(self, user_id, shard: dict) -> None:
+        """Writes the user's shard file"""
+        shard_file = self._shard_file(user_id)
+        try:
+            with open(shard_file, "w", encoding="utf-8") as handle:
+                json.dump(shard, handle, indent=4)
+        except Exception:
+            self._shards.pop(str(user_id), None)
+            raise
+        finally:
+            self._written(shard_file)
+        self._shards[str(user_id)] = (self._path_stamp(shard_file), shard)
+
+    def _apply_change(self, data, change: dict) -> None:
+        """Movies of a new user are kept in its shard, not in directory.json"""
+        if change["op"] == "add_user":
+            change["user"].pop("movies", None)
+        super()._apply_change(data, change)
+
+    @changes_snapshot
+    @synchronized
+    def delete_user_info(self, user_id, form):
+        """Deletes user record from directory.json and its shard file"""
+        super().delete_user_info(user_id, form)
+        self._shards.pop(str(user_id), None)
+        if os.path.exists(self._shard_file(user_id)):
+            os.remove(self._shard_file(user_id))
+
+    def _user_shard(self, user_id) -> dict:
+        """Returns the parsed shard of an existing user"""
+        if str(user_id) not in self._read_file()["users"]:
+            raise JsonStorageErrors("User ID is not valid")
+        return self._read_shard(user_id)
+
+    def _user_movies(self, user_id) -> dict:
+        """Returns {movie_id: movie} dictionary from the user's shard"""
+        return self._user_shard(user_id).get("movies")
+
+    @request_snapshot
+    @synchronized
+    def get_user_movies(
+        self, user_id: int, after_id: int = None, limit: int = None
+    ) -> list | None:
+        """Get all movies for given user from its shard, or a keyset page"""
+        return self.keyset_page(self._user_movies(user_id).values(), after_id, limit)
+
+    def movie_unique_id(self, user_id) -> int:
+        """Returns next ID of the shard's movies sequence"""
+        return self._read_shard(user_id)["sequences"]["movies"] + 1
+
+    @changes_snapshot
+    @synchronized
+    def add_movie_in_user_list(self, userdata) -> tuple[bool, str]:
+        """Add a movie to the user's shard."""
+        user_id = str(userdata.get("id"))
+        if user_id not in self._read_file()["users"]:
+            return (
+                False,
+                "User ID is not valid to add new movie to the list.",
+            )
+        new_movie = userdata.get("movie")
+        new_movie["id"] = self.movie_unique_id(user_id)
+        shard = self._read_shard(user_id)
+        shard["movies"][str(new_movie["id"])] = new_movie
+        shard["sequences"]["movies"] = new_movie["id"]
+        self._write_shard(user_id, shard)
+        return True, "New Movie Added Successfully"
+
+    @changes_snapshot
+    @synchronized
+    def update_movie_in_user_list(self, user_id, movie_id, form):
+        """Update a movie in the user's shard."""
+        shard = self._user_shard(user_id)
+        target_movie = shard["movies"].get(str(movie_id))
+        if target_movie is None:
+            raise JsonStorageErrors("Movie ID is not valid")
+        target_movie.update(
+            {
+                "Title": form.title.data.title().strip(),
+                "Year": form.year.data,
+                "imdbRating": form.rate.data,
+            }
         )
-        self._write_file(data)
+        self._write_shard(user_id, shard)
+
+    @changes_snapshot
+    @synchronized
+    def delete_movie_from_user_list(self, user_id: int, movie_id: int) -> str:
+        """Delete a movie from the user's shard."""
+        shard = self._user_shard(user_id)
+        deleted_movie = shard["movies"].get(str(movie_id))
+        if deleted_movie is None:
+            raise JsonStorageErrors("Movie ID is not valid")
+        del shard["movies"][str(movie_id)]
+        self._write_shard(user_id, shard)
         return f"{deleted_movie.get('Title')} deleted."
@@ -0,0 +1,37 @@
+"""Persisted ID sequences for file based storages.
+Last given ID of every sequence is saved in a small JSON file next to the data
+files, so a new ID does not need a scan of the data and IDs of deleted records
+are never given again"""
+
+import json
+
+
+class SequenceStore:
+    """{sequence name: last given ID} saved in a JSON file"""
+
+    def __init__(self, sequence_file: str, seeds: dict) -> None:
+        """seeds maps sequence names to functions returning the highest ID
+        already in the data, a seed is called only if its sequence is not
+        saved yet"""
+        self._sequence_file = sequence_file
+        self._seeds = seeds
+
+    def _load(self) -> dict:
+        """Reads saved sequences, missing ones get their seed value"""
+        try:
+            with open(self._sequence_file, "r", encoding="utf-8") as handle:
+                last_ids = json.load(handle)
+        except (OSError, json.decoder.JSONDecodeError):
+            last_ids = {}
+        for name, seed in self._seeds.items():
+            if name not in last_ids:
+                last_ids[name] = int(seed())
+        return last_ids
+
+    def next_id(self, name: str) -> int:
+        """Increments and saves the sequence, returns the new ID"""
+        last_ids = self._load()
+        last_ids[name] += 1
+        with open(self._sequence_file, "w", encoding="utf-8") as handle:
+            json.dump(last_ids, handle)
+        return last_ids[name]
@@ -1,8 +1,100 @@
 """Sqlite Storage Methods"""
-from sqlalchemy import exc
+import re
+from flask import abort
+from sqlalchemy import (
+    bindparam,
+    delete,
+    event,
+    exc,
+    func,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import joinedload
+from werkzeug.security import generate_password_hash
 from datamanagement.sqlite_models import db
 from datamanagement.storage_inheritance import os, DataManagmentInterface as DMI
-from datamanagement.sqlite_models import User, Movie, Review
+from datamanagement.sqlite_models import User, Movie, Review, Catalog, average_rating
+
+# Engine profiles: pragmas set on every new connection and pool options.
+# "concurrent" lets readers go on while a write is in flight (WAL) and makes
+# a writer wait for the lock instead of failing with "database is locked"
+SQLITE_PROFILES = {
+    "default": {"pragmas": {}, "pool": {}},
+    "concurrent": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "busy_timeout": 5000,
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,
+            "temp_store": "MEMORY",
+        },
+        "pool": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30},
+    },
+}
+
+
+# Hot queries built once at import, values are bound on every call, so a call
+# skips statement construction and reuses the statement's compiled form
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+USER_MOVIE = select(Movie).where(
+    Movie.user_id == bindparam("user_id"), Movie.id == bindparam("movie_id")
+)
+# after_id 0 is the first page, negative LIMIT is no limit in SQLite
+USER_MOVIES_PAGE = (
+    select(Movie)
+    .where(Movie.user_id == bindparam("user_id"), Movie.id > bindparam("after_id"))
+    .order_by(Movie.id)
+    .limit(bindparam("limit"))
+)
+
+# Movies and reviews matching a full text query. bm25 scores of the two
+# FTS tables are not on one scale, so each source is ranked on its own
+# and the two rankings are interleaved: best movie, best review, second
+# movie, second review... snippet marks matched words with [ ]
+SEARCH_SQL = text(
+    """
+    WITH movie_hits AS (
+        SELECT rowid AS id, bm25(movies_fts) AS rank,
+            snippet(movies_fts, 0, '[', ']', '...', 12) AS snippet
+        FROM movies_fts
+        WHERE movies_fts MATCH :query
+    ),
+    review_hits AS (
+        SELECT rowid AS id, bm25(reviews_fts) AS rank,
+            snippet(reviews_fts, 0, '[', ']', '...', 12) AS snippet
+        FROM reviews_fts
+        WHERE reviews_fts MATCH :query
+    )
+    SELECT kind, movie_id, user_id, review_id, title, snippet, rank
+    FROM (
+        SELECT 'movie' AS kind, movies.id AS movie_id, movies.user_id AS user_id,
+            NULL AS review_id, coalesce(movies."Title", catalog."Title") AS title,
+            movie_hits.snippet AS snippet, movie_hits.rank AS rank,
+            row_number() OVER (ORDER BY movie_hits.rank, movies.id) AS position
+        FROM movie_hits
+        JOIN movies ON movies.id = movie_hits.id
+        LEFT JOIN catalog ON catalog."imdbID" = movies."imdbID"
+        UNION ALL
+        SELECT 'review', movies.id, reviews.user_id, reviews.id,
+            coalesce(movies."Title", catalog."Title"),
+            review_hits.snippet, review_hits.rank,
+            row_number() OVER (ORDER BY review_hits.rank, reviews.id)
+        FROM review_hits
+        JOIN reviews ON reviews.id = review_hits.id
+        JOIN movies ON movies.id = reviews.movie_id
+        LEFT JOIN catalog ON catalog."imdbID" = movies."imdbID"
+    )
+    ORDER BY position, kind
+    LIMIT :limit OFFSET :offset
+    """
+)
 
 
 class SqliteErrors(Exception):
@@ -21,6 +113,27 @@ class SqliteStorage(DMI):
         file_path = os.path.join(DMI.logs_dir, f"{filename}.db")
         self.filename = file_path
 
+    def init_app(self, app, profile: str = "default"):
+        """Binds db to the Flask app with the given SQLITE_PROFILES engine
+        profile and creates missing tables"""
+        if profile not in SQLITE_PROFILES:
+            raise SqliteErrors(f"Unknown SQLite engine profile {profile}")
+        # ON DELETE CASCADE of the schema needs foreign keys enforced
+        pragmas = {"foreign_keys": "ON", **SQLITE_PROFILES[profile]["pragmas"]}
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.filename}"
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(SQLITE_PROFILES[profile]["pool"])
+        db.init_app(app)
+
+        def set_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            for pragma, value in pragmas.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+            cursor.close()
+
+        with app.app_context():
+            event.listen(db.engine, "connect", set_pragmas)
+            db.create_all()
+
     def check_password(self, user_id, password) -> bool:
         """First find user by name
         Calls User Instance to use its verify password method"""
@@ -38,18 +151,65 @@ class SqliteStorage(DMI):
         db.session.add(review)
         db.session.commit()
 
-    def all_revies(self):
+    def all_revies(self, after_id: int = None, limit: int = None):
         """Display all reviews for sqlite database"""
-        revies = Review.query.order_by(Review.id).all()
-        return revies
+        return self.review_feed(after_id, limit)
+
+    def review_feed(self, after_id: int = None, limit: int = None) -> list:
+        """All reviews, or a keyset page of reviews after the review after_id,
+        with their reviewer and movie loaded in the same statement, so
+        rendering review.reviewer and review.view does not query again for
+        every review"""
+        query = Review.query.options(
+            joinedload(Review.reviewer), joinedload(Review.view)
+        )
+        if after_id is not None:
+            query = query.filter(Review.id > after_id)
+        return query.order_by(Review.id).limit(limit).all()
 
-    def find_user(self, username: str = None, user_id: int = None) -> User | None:
-        """Query for SQL to find user by id"""
+    @staticmethod
+    def match_query(words: str) -> str | None:
+        """FTS5 MATCH query of the words a user typed: every word has to be in
+        the text, the last one may be a prefix. Words are quoted so FTS5
+        syntax characters in user input do not break the query"""
+        tokens = re.findall(r"\w+", words or "")
+        if not tokens:
+            return None
+        quoted = [f'"{token}"' for token in tokens]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def search(
+        self, words: str, page: int = 1, limit: int = 20, fetch: int = None
+    ) -> list[dict]:
+        """Ranked full text search over movie titles and review texts.
+        Returns one page of {kind, movie_id, user_id, review_id, title,
+        snippet, rank} dictionaries, best matches first. fetch rows are
+        read from the start of the page, limit of them by default"""
+        query = self.match_query(words)
+        if query is None:
+            return []
+        rows = db.session.execute(
+            SEARCH_SQL,
+            {
+                "query": query,
+                "limit": limit if fetch is None else fetch,
+                "offset": (max(page, 1) - 1) * limit,
+            },
+        )
+        return [dict(row) for row in rows.mappings()]
+
+    def find_user(
+        self, username: str = None, user_id: int = None, email: str = None
+    ) -> User | None:
+        """Query for SQL to find user by id, username or email.
+        By id the session identity map is checked before querying"""
         if user_id is not None:
-            user = User.query.get(user_id)
-            return user
+            return db.session.get(User, user_id)
         if username is not None:
-            return User.query.filter_by(username=username).first()
+            return db.session.scalars(USER_BY_USERNAME, {"username": username}).first()
+        if email is not None:
+            return db.session.scalars(USER_BY_EMAIL, {"email": email}).first()
         return None
 
     def update_user_info(self, user_id, form):
@@ -57,7 +217,7 @@ class SqliteStorage(DMI):
         # For Apis form instance convert to dict object
         form_data = form.data
         user = self.find_user(user_id=user_id)
-        if not self.check_password(user_id=user_id, password=form_data.get("password")):
+        if user is None or not user.verify_password(form_data.get("password")):
             raise SqliteErrors("Invalid Password")
         # Getting userdata as user instance
         user.name = form_data.get("name", user.name)
@@ -73,30 +233,140 @@ class SqliteStorage(DMI):
     def delete_user_info(self, user_id, form):
         """Update user infor with OREM"""
         userdata = form.data
-        if not self.check_password(user_id=user_id, password=userdata["password"]):
-            raise SqliteErrors("Invalid Password")
         user = self.find_user(user_id=user_id)
+        if user is None or not user.verify_password(userdata["password"]):
+            raise SqliteErrors("Invalid Password")
         try:
-            db.session.delete(user)
+            # Movies and reviews of the user go by ON DELETE CASCADE
+            db.session.execute(delete(User).where(User.id == user.id))
             db.session.commit()
         except Exception as exc_er:
             raise SqliteErrors(
                 f"SQLite server closed or error occured {exc_er}"
             ) from exc_er
 
-    def get_all_users(self) -> list:
-        """ORM query to get the as list of dictionaries like object"""
-        users = User.query.order_by(User.name).all()
-        return users
+    def get_all_users(
+        self, after_id: int = None, limit: int = None, after_name: str = None
+    ) -> list:
+        """ORM query to get the users ordered by name, or a keyset page of
+        users coming after (after_name, after_id) in (name, id) order"""
+        query = User.query.order_by(User.name, User.id)
+        if after_id is not None:
+            after_name = self._cursor_name(after_id, after_name)
+            if after_name is None:
+                return []
+            query = query.filter(tuple_(User.name, User.id) > (after_name, after_id))
+        return query.limit(limit).all()
+
+    @staticmethod
+    def _cursor_name(after_id: int, after_name: str = None) -> str | None:
+        """Name half of a (name, id) users cursor. Cursors without the name
+        look it up, None if the cursor user was deleted meanwhile, since
+        there is no position left to continue from"""
+        if after_name is not None:
+            return after_name
+        return db.session.scalar(select(User.name).where(User.id == after_id))
 
-    def get_user_movies(self, user_id) -> list | None:
-        """Get all movies for given user"""
-        user = User.query.get(user_id)
+    def get_user_movies(
+        self, user_id, after_id: int = None, limit: int = None
+    ) -> list | None:
+        """Get all movies for given user, or a keyset page of movies with ID
+        greater than after_id, served by the (user_id, id) index"""
+        user = db.session.get(User, user_id)
         if user is None:
             return None
-        movies = user.movies
+        values = {
+            "user_id": user.id,
+            "after_id": 0 if after_id is None else after_id,
+            "limit": -1 if limit is None else limit,
+        }
+        return db.session.scalars(USER_MOVIES_PAGE, values).all()
+
+    def find_users(self, user_ids) -> dict:
+        """{user ID: User} of the given IDs with one IN query"""
+        users = db.session.scalars(select(User).where(User.id.in_(list(user_ids))))
+        return {user.id: user for user in users}
+
+    def get_movies_for_users(self, user_ids) -> dict:
+        """{user ID: movies ordered by ID} of the given IDs with one IN query"""
+        movies = {int(user_id): [] for user_id in user_ids}
+        for movie in db.session.scalars(
+            select(Movie)
+            .where(Movie.user_id.in_(list(movies)))
+            .order_by(Movie.user_id, Movie.id)
+        ):
+            movies[movie.user_id].append(movie)
         return movies
 
+    def get_movies(self, user_id, movie_ids) -> dict:
+        """{movie ID: Movie} of the given IDs in the user's list with one
+        IN query"""
+        movies = db.session.scalars(
+            select(Movie).where(
+                Movie.user_id == user_id, Movie.id.in_(list(movie_ids))
+            )
+        )
+        return {movie.id: movie for movie in movies}
+
+    def user_rows(
+        self, after_id: int = None, limit: int = None, after_name: str = None
+    ) -> list[dict]:
+        """get_all_users projection for read only endpoints: User.to_dict()
+        columns selected into plain dictionaries, no ORM instances"""
+        users = User.__table__
+        query = select(
+            users.c.id,
+            users.c.name,
+            users.c.username,
+            users.c.email,
+            users.c.movie_count,
+            users.c.rating_sum,
+            users.c.rated_count,
+            users.c.last_movie_added,
+            users.c.review_count,
+        )
+        if after_id is not None:
+            after_name = self._cursor_name(after_id, after_name)
+            if after_name is None:
+                return []
+            query = query.where(
+                tuple_(users.c.name, users.c.id) > (after_name, after_id)
+            )
+        query = query.order_by(users.c.name, users.c.id).limit(limit)
+        rows = []
+        for row in db.session.execute(query).mappings():
+            row = dict(row)
+            row["average_rating"] = average_rating(
+                row.pop("rating_sum"), row.pop("rated_count")
+            )
+            rows.append(row)
+        return rows
+
+    def user_movie_rows(
+        self, user_id, after_id: int = None, limit: int = None
+    ) -> list[dict] | None:
+        """get_user_movies projection for read only endpoints: Movie.to_dict()
+        columns, catalog values filled in, selected into plain dictionaries"""
+        users, movies, catalog = User.__table__, Movie.__table__, Catalog.__table__
+        user_query = select(users.c.id).where(users.c.id == user_id)
+        if db.session.execute(user_query).first() is None:
+            return None
+        query = (
+            select(
+                movies.c.id,
+                movies.c.imdbID,
+                func.coalesce(movies.c.Title, catalog.c.Title).label("Title"),
+                func.coalesce(movies.c.Year, catalog.c.Year).label("Year"),
+                func.coalesce(movies.c.imdbRating, catalog.c.imdbRating).label("Rate"),
+            )
+            .select_from(movies.outerjoin(catalog, catalog.c.imdbID == movies.c.imdbID))
+            .where(movies.c.user_id == user_id)
+        )
+        if after_id is not None:
+            query = query.where(movies.c.id > after_id)
+        query = query.order_by(movies.c.id).limit(limit)
+        return [dict(row) for row in db.session.execute(query).mappings()]
+
     def add_new_user(self, userdata: dict) -> None | SqliteErrors:
         """Adding new user to sqlite database"""
         user = User(
@@ -118,53 +388,186 @@ class SqliteStorage(DMI):
             ) from alchemy_er
 
     def add_movie_in_user_list(self, userdata) -> tuple[bool, str]:
-        """Add a movie to a user's list."""
+        """Add a movie to a user's list. A movie with IMDb ID is stored once in
+        the catalog (its metadata refreshed) and the user's row only links to
+        it, a movie without IMDb ID keeps its values in the user's row"""
         user_id = userdata.get("id")
         user = self.find_user(user_id=user_id)
         if not user:
             return False, "User does not exist"
-        new_movie = Movie(
-            Title=userdata.get("movie").get("Title"),
-            Year=userdata.get("movie").get("Year"),
-            imdbRating=userdata.get("movie").get("imdbRating"),
-            Poster=userdata.get("movie").get("Poster"),
-            user_id=user_id,
-        )
+        movie = userdata.get("movie")
+        metadata = {
+            "Title": movie.get("Title"),
+            "Year": movie.get("Year"),
+            "imdbRating": movie.get("imdbRating"),
+            "Poster": movie.get("Poster"),
+        }
         try:
+            if movie.get("imdbID"):
+                db.session.execute(
+                    insert(Catalog)
+                    .values(imdbID=movie.get("imdbID"), **metadata)
+                    .on_conflict_do_update(index_elements=["imdbID"], set_=metadata)
+                )
+                new_movie = Movie(imdbID=movie.get("imdbID"), user_id=user_id)
+            else:
+                new_movie = Movie(**metadata, user_id=user_id)
             db.session.add(new_movie)
             db.session.commit()
             return True, "New Movie Added Successfully"
         except exc.SQLAlchemyError:
+            db.session.rollback()
             return False, "SqliteError: adding new movie to user list"
 
+    @staticmethod
+    def failed_batch(results: list, message: str) -> list[tuple[bool, str]]:
+        """Results of a rolled back batch, rows which passed validation
+        failed with message"""
+        return [(False, message) if result[0] else result for result in results]
+
+    def add_users_bulk(self, users: list[dict]) -> list[tuple[bool, str]]:
+        """Adds many users in one transaction. Taken usernames and emails are
+        found with one query and valid users are inserted with one executemany.
+        Returns (added, message) for every given user in order"""
+        usernames = [user.get("username") for user in users]
+        emails = [user.get("email") for user in users if user.get("email")]
+        taken = set()
+        for username, email in db.session.execute(
+            select(User.username, User.email).where(
+                or_(User.username.in_(usernames), User.email.in_(emails))
+            )
+        ):
+            taken.update({("username", username), ("email", email)})
+        rows, results = [], []
+        for user in users:
+            if not all(user.get(field) for field in ("name", "username", "password")):
+                results.append((False, "Name, username and password are required"))
+                continue
+            keys = {("username", user["username"])}
+            if user.get("email"):
+                keys.add(("email", user["email"]))
+            if taken & keys:
+                results.append((False, "User name or email already existed"))
+                continue
+            taken |= keys
+            rows.append(
+                {
+                    "name": user["name"],
+                    "username": user["username"],
+                    "email": user.get("email"),
+                    "password_hash": generate_password_hash(user["password"]),
+                }
+            )
+            results.append((True, "New User Added Successfully"))
+        if not rows:
+            return results
+        try:
+            db.session.execute(
+                insert(User), rows, execution_options={"render_nulls": True}
+            )
+            db.session.commit()
+        except exc.SQLAlchemyError:
+            db.session.rollback()
+            return self.failed_batch(results, "SqliteError: adding new users")
+        return results
+
+    def add_movies_bulk(self, user_id, movies: list[dict]) -> list[tuple[bool, str]]:
+        """Adds many movies to a user's list in one transaction, catalog
+        entries are upserted and movies inserted with one executemany each.
+        Returns (added, message) for every given movie in order"""
+        if self.find_user(user_id=user_id) is None:
+            return [(False, "User does not exist")] * len(movies)
+        catalog, rows, results = {}, [], []
+        for movie in movies:
+            metadata = {
+                "Title": movie.get("Title"),
+                "Year": movie.get("Year"),
+                "imdbRating": movie.get("imdbRating"),
+                "Poster": movie.get("Poster"),
+            }
+            if not metadata["Title"]:
+                results.append((False, "Movie title is required"))
+                continue
+            row = {"imdbID": movie.get("imdbID"), "user_id": user_id}
+            if row["imdbID"]:
+                catalog[row["imdbID"]] = {"imdbID": row["imdbID"], **metadata}
+                metadata = dict.fromkeys(metadata)
+            row.update(
+                title_override=metadata["Title"],
+                year_override=metadata["Year"],
+                rating_override=metadata["imdbRating"],
+                poster_override=metadata["Poster"],
+            )
+            rows.append(row)
+            results.append((True, "New Movie Added Successfully"))
+        if not rows:
+            return results
+        try:
+            if catalog:
+                upsert = insert(Catalog)
+                upsert = upsert.on_conflict_do_update(
+                    index_elements=["imdbID"],
+                    set_={
+                        field: upsert.excluded[field]
+                        for field in ("Title", "Year", "imdbRating", "Poster")
+                    },
+                )
+                db.session.execute(upsert, list(catalog.values()))
+            # render_nulls keeps None values, otherwise rows with different
+            # None columns are split into separate INSERT batches
+            db.session.execute(
+                insert(Movie), rows, execution_options={"render_nulls": True}
+            )
+            db.session.commit()
+        except exc.SQLAlchemyError:
+            db.session.rollback()
+            return self.failed_batch(results, "SqliteError: adding new movies")
+        return results
+
     def get_target_movie(self, user_id, movie_id) -> Movie | None:
         """Get a movie by given movie_id for a specific user"""
-        target_movie = Movie.query.filter_by(user_id=user_id, id=movie_id).first_or_404(
-            description="Given Movie or User ID Invalid"
-        )
-        # <class 'Movie'> or None
+        values = {"user_id": user_id, "movie_id": movie_id}
+        target_movie = db.session.scalars(USER_MOVIE, values).first()
+        if target_movie is None:
+            abort(404, description="Given Movie or User ID Invalid")
+        # <class 'Movie'>
 
         return target_movie
 
     def update_movie_in_user_list(self, user_id, movie_id, form):
-        """Update a movie from a user's list."""
+        """Update a movie from a user's list with a single
+        UPDATE ... WHERE user_id=? AND id=? statement"""
         try:
-            movie_to_update = self.get_target_movie(user_id, movie_id)
-            # if query did not throw 404 Error Update Movie Details
-            movie_to_update.Title = form.title.data.title()
-            movie_to_update.Year = form.year.data
-            movie_to_update.imdbRating = form.rate.data
+            updated = db.session.execute(
+                update(Movie)
+                .where(Movie.user_id == user_id, Movie.id == movie_id)
+                .values(
+                    title_override=form.title.data.title(),
+                    year_override=form.year.data,
+                    rating_override=form.rate.data,
+                )
+                .returning(Movie.id)
+            ).scalar_one_or_none()
+            if updated is None:
+                raise SqliteErrors("Given Movie or User ID Invalid")
             db.session.commit()
         except Exception as update_er:
+            db.session.rollback()
             raise SqliteErrors(f"SQLITE Update Error {update_er}") from update_er
 
     def delete_movie_from_user_list(self, user_id, movie_id) -> str:
-        """Delete a movie from user`s list"""
-        target_movie = self.get_target_movie(user_id, movie_id)
-        movie_to_delete = target_movie
+        """Delete a movie from user`s list with DELETE ... RETURNING,
+        its reviews go by ON DELETE CASCADE"""
         try:
-            db.session.delete(movie_to_delete)
+            title = db.session.execute(
+                delete(Movie)
+                .where(Movie.user_id == user_id, Movie.id == movie_id)
+                .returning(Movie.Title)
+            ).scalar_one_or_none()
             db.session.commit()
-            return f"{target_movie.Title} deleted"
         except Exception as delete_er:
+            db.session.rollback()
             raise SqliteErrors(f"SQLITE Delete Error {delete_er}") from delete_er
+        if title is None:
+            abort(404, description="Given Movie or User ID Invalid")
+        return f"{title} deleted"
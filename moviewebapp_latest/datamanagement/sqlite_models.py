@@ -3,25 +3,50 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
 
+def average_rating(rating_sum: float, rated_count: int) -> float | None:
+    """Average rating of a user's rated movies, None if none is rated"""
+    if not rated_count:
+        return None
+    return round(rating_sum / rated_count, 2)
+
+
 class User(db.Model, UserMixin):
     """User model"""
 
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    username = db.Column(db.String(200), nullable=False, unique=True)
-    email = db.Column(db.String(100), nullable=True, unique=True)
+    # Users page is ordered and paged by name
+    name = db.Column(db.String(200), nullable=False, index=True)
+    # Unique indexes ix_users_username and ix_users_email serve the lookups
+    username = db.Column(db.String(200), nullable=False, unique=True, index=True)
+    email = db.Column(db.String(100), nullable=True, unique=True, index=True)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     password_hash = db.Column(db.String(128), nullable=False)
-    # user have many movie in its list
-    movies = db.relationship("Movie", backref="user", lazy=True, cascade="all,delete")
+    # Aggregates of the user's movies and reviews kept by USER_STATS_DDL
+    # triggers in the same transaction as the change, read without a scan
+    movie_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    rated_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_movie_added = db.Column(db.DateTime, nullable=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # user have many movie in its list, deleting a user deletes its movies
+    # and reviews by ON DELETE CASCADE without loading them (passive_deletes)
+    movies = db.relationship(
+        "Movie", backref="adder", lazy=True, cascade="all,delete", passive_deletes=True
+    )
     reviews = db.relationship(
-        "Review", backref="reviewer", lazy=True, cascade="all,delete"
+        "Review",
+        backref="reviewer",
+        lazy=True,
+        cascade="all,delete",
+        passive_deletes=True,
     )
 
     @property
@@ -39,6 +64,11 @@ class User(db.Model, UserMixin):
         """Verify user password"""
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def average_rating(self) -> float | None:
+        """Average imdbRating of the user's rated movies"""
+        return average_rating(self.rating_sum, self.rated_count)
+
     def to_dict(self):
         """Returns dict representation of instance"""
         return {
@@ -46,6 +76,10 @@ class User(db.Model, UserMixin):
             "name": self.name,
             "username": self.username,
             "email": self.email,
+            "movie_count": self.movie_count,
+            "average_rating": self.average_rating,
+            "last_movie_added": self.last_movie_added,
+            "review_count": self.review_count,
         }
 
     def __repr__(self):
@@ -53,24 +87,77 @@ class User(db.Model, UserMixin):
         return f"name: {self.name} username: {self.username}"
 
 
-class Movie(db.Model):
-    """Movie row properties"""
+class Catalog(db.Model):
+    """Shared movie catalog, one row of OMDb metadata per IMDb ID"""
 
-    __tablename__ = "movies"
-    id = db.Column(db.Integer, primary_key=True)
+    __tablename__ = "catalog"
+    imdbID = db.Column(db.String(20), primary_key=True)
     Title = db.Column(db.String(200), nullable=False)
-    # director = db.Column(db.String(200), nullable=False)
     Year = db.Column(db.String(100), nullable=True)
     imdbRating = db.Column(db.Float, nullable=True)
     Poster = db.Column(db.String(250), nullable=True)
+
+    def __repr__(self):
+        """Model representation"""
+        return f"imdbID: {self.imdbID} name: {self.Title}"
+
+
+def catalog_field(override: str, field: str) -> hybrid_property:
+    """Movie attribute which is the user's override column if it is set,
+    otherwise the field of the movie's catalog entry"""
+
+    def getter(movie):
+        value = getattr(movie, override)
+        if value is None and movie.catalog is not None:
+            return getattr(movie.catalog, field)
+        return value
+
+    def setter(movie, value):
+        setattr(movie, override, value)
+
+    def expression(cls):
+        catalog_value = (
+            select(getattr(Catalog, field))
+            .where(Catalog.imdbID == cls.imdbID)
+            .scalar_subquery()
+        )
+        return func.coalesce(getattr(cls, override), catalog_value)
+
+    return hybrid_property(getter, setter, expr=expression)
+
+
+class Movie(db.Model):
+    """Link of a user and a catalog movie. Title, Year, imdbRating and
+    Poster columns hold the user's overrides, NULL falls back to the
+    catalog entry. Movies added before the catalog have no imdbID and keep
+    all values in their own columns"""
+
+    __tablename__ = "movies"
+    # user's list and user's movie by ID lookups
+    __table_args__ = (db.Index("ix_movies_user_id_id", "user_id", "id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    imdbID = db.Column(db.String(20), db.ForeignKey("catalog.imdbID"), index=True)
+    catalog = db.relationship("Catalog", lazy="joined")
+    title_override = db.Column("Title", db.String(200), nullable=True)
+    # director = db.Column(db.String(200), nullable=False)
+    year_override = db.Column("Year", db.String(100), nullable=True)
+    rating_override = db.Column("imdbRating", db.Float, nullable=True)
+    poster_override = db.Column("Poster", db.String(250), nullable=True)
+    Title = catalog_field("title_override", "Title")
+    Year = catalog_field("year_override", "Year")
+    imdbRating = catalog_field("rating_override", "imdbRating")
+    Poster = catalog_field("poster_override", "Poster")
     # Relationship with
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
-    reviews = db.relationship("Review", backref="view", lazy=True, cascade="all,delete")
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+    reviews = db.relationship(
+        "Review", backref="view", lazy=True, cascade="all,delete", passive_deletes=True
+    )
 
     def to_dict(self):
         """Dictionary representation"""
         return {
             "id": self.id,
+            "imdbID": self.imdbID,
             "Title": self.Title,
             "Year": self.Year,
             "Rate": self.imdbRating,
@@ -86,6 +173,102 @@ class Review(db.Model):
 
     __tablename__ = "reviews"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
-    movie_id = db.Column(db.Integer, db.ForeignKey("movies.id"))
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    movie_id = db.Column(
+        db.Integer, db.ForeignKey("movies.id", ondelete="CASCADE"), index=True
+    )
     review_text = db.Column(db.Text)
+
+
+# FTS5 full text search over movie titles and review texts. rowid of
+# movies_fts is movies.id and rowid of reviews_fts is reviews.id, triggers
+# keep both in sync with their tables and with catalog title changes
+MOVIE_TITLE_SQL = (
+    'coalesce(new."Title", '
+    '(SELECT "Title" FROM catalog WHERE "imdbID" = new."imdbID"))'
+)
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+    "title, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5("
+    "review_text, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN "
+    f"INSERT INTO movies_fts(rowid, title) VALUES (new.id, {MOVIE_TITLE_SQL}); END",
+    'CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF "Title", '
+    '"imdbID" ON movies BEGIN '
+    f"UPDATE movies_fts SET title = {MOVIE_TITLE_SQL} WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN "
+    "DELETE FROM movies_fts WHERE rowid = old.id; END",
+    'CREATE TRIGGER IF NOT EXISTS catalog_fts_update AFTER UPDATE OF "Title" '
+    'ON catalog BEGIN UPDATE movies_fts SET title = new."Title" WHERE rowid IN '
+    '(SELECT id FROM movies WHERE "imdbID" = new."imdbID" AND "Title" IS NULL); END',
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN "
+    "INSERT INTO reviews_fts(rowid, review_text) "
+    "VALUES (new.id, new.review_text); END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review_text "
+    "ON reviews BEGIN UPDATE reviews_fts SET review_text = new.review_text "
+    "WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN "
+    "DELETE FROM reviews_fts WHERE rowid = old.id; END",
+]
+
+# Triggers keeping users aggregate columns up to date. A movie's rating is its
+# override or its catalog rating, so a catalog rating change moves the sums
+# of the users having that movie without an override
+def movie_rating_sql(row: str) -> str:
+    """Rating of the movies row new or old in trigger SQL"""
+    return (
+        f'coalesce({row}."imdbRating", '
+        f'(SELECT "imdbRating" FROM catalog WHERE "imdbID" = {row}."imdbID"))'
+    )
+
+
+def user_stats_sql(row: str, sign: str, added: bool = False) -> str:
+    """UPDATE adding (sign "+") or removing (sign "-") the movies row new or
+    old to its user's aggregates, added sets last_movie_added as well"""
+    rating = movie_rating_sql(row)
+    last_added = ", last_movie_added = CURRENT_TIMESTAMP" if added else ""
+    return (
+        f"UPDATE users SET movie_count = movie_count {sign} 1, "
+        f"rating_sum = rating_sum {sign} coalesce({rating}, 0), "
+        f"rated_count = rated_count {sign} ({rating} IS NOT NULL){last_added} "
+        f"WHERE id = {row}.user_id;"
+    )
+
+
+CATALOG_MOVIES_SQL = (
+    'FROM movies WHERE user_id = users.id AND "imdbID" = new."imdbID" '
+    'AND "imdbRating" IS NULL'
+)
+USER_STATS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_insert AFTER INSERT ON movies "
+    f"BEGIN {user_stats_sql('new', '+', added=True)} END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_update AFTER UPDATE OF "
+    '"imdbRating", "imdbID", user_id ON movies BEGIN '
+    f"{user_stats_sql('old', '-')} {user_stats_sql('new', '+')} END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_delete AFTER DELETE ON movies "
+    f"BEGIN {user_stats_sql('old', '-')} END",
+    'CREATE TRIGGER IF NOT EXISTS user_stats_catalog_update AFTER UPDATE OF '
+    '"imdbRating" ON catalog WHEN old."imdbRating" IS NOT new."imdbRating" BEGIN '
+    "UPDATE users SET rating_sum = rating_sum + (SELECT count(*) * "
+    '(coalesce(new."imdbRating", 0) - coalesce(old."imdbRating", 0)) '
+    f"{CATALOG_MOVIES_SQL}), rated_count = rated_count + (SELECT count(*) * "
+    '((new."imdbRating" IS NOT NULL) - (old."imdbRating" IS NOT NULL)) '
+    f"{CATALOG_MOVIES_SQL}) WHERE id IN (SELECT user_id FROM movies "
+    'WHERE "imdbID" = new."imdbID" AND "imdbRating" IS NULL); END',
+    "CREATE TRIGGER IF NOT EXISTS user_stats_review_insert AFTER INSERT ON reviews "
+    "BEGIN UPDATE users SET review_count = review_count + 1 "
+    "WHERE id = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_review_delete AFTER DELETE ON reviews "
+    "BEGIN UPDATE users SET review_count = review_count - 1 "
+    "WHERE id = old.user_id; END",
+]
+
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(_, connection, **__):
+    """db.create_all() creates search tables and triggers as well"""
+    for statement in SEARCH_DDL + USER_STATS_DDL:
+        connection.exec_driver_sql(statement)
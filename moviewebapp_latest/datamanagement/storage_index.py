@@ -0,0 +1,211 @@
+"""Sidecar lookup indexes for file based storages.
+Index file is saved next to its data file (users.csv -> users.csv.index) and
+carries the data file stamp it was built for, so an index which does not match
+its data file is known to be stale and gets rebuilt. Changes made by appends to
+the data file are appended to users.csv.index.log instead of rewriting the
+index, every log line carries the data file stamps before and after it"""
+
+import json
+from datamanagement.storage_inheritance import os
+
+
+def file_stamp(path: str) -> tuple[int, int, int] | None:
+    """Inode, modification time in nanoseconds and size of a file, None if it
+    does not exist. A file replaced by another one gets a new inode even if
+    both have the same size and modification time"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class StorageIndex:
+    """Keeps {field: {value: record ID}} maps of unique fields,
+    {field: {value: [byte offsets]}} maps of grouping fields and
+    {record ID: byte offset} of records in the data file. dead_rows counts
+    rows of the data file which are not live records anymore"""
+
+    # Log lines kept at least before they are folded into the index file,
+    # a longer log is folded once it has half as many lines as the index has
+    # records, so an index is rewritten only every time it about doubles
+    FOLD_AFTER = 1000
+
+    def __init__(self, data_file: str, fields: tuple, groups: tuple = ()) -> None:
+        self._data_file = data_file
+        self._index_file = f"{data_file}.index"
+        self._log_file = f"{data_file}.index.log"
+        self.fields = fields
+        self.groups = groups
+        self._maps = {field: {} for field in fields}
+        self._groups = {field: {} for field in groups}
+        self._offsets = {}
+        self.dead_rows = 0
+        self._stamp = None
+        # put / discard changes not in the index or log files yet
+        self._changes = []
+        self._log_lines = 0
+
+    def _data_stamp(self) -> tuple[int, int, int] | None:
+        """Returns file_stamp of the data file"""
+        return file_stamp(self._data_file)
+
+    def is_fresh(self) -> bool:
+        """True if index was built for the current state of the data file"""
+        return self._stamp is not None and self._stamp == self._data_stamp()
+
+    def load(self) -> bool:
+        """Loads saved index file and replays its log, returns False if they
+        are missing or stale"""
+        if self.is_fresh():
+            return True
+        try:
+            with open(self._index_file, "r", encoding="utf-8") as handle:
+                saved = json.load(handle)
+        except (OSError, json.decoder.JSONDecodeError):
+            return False
+        if (
+            set(saved.get("maps", {})) != set(self.fields)
+            or set(saved.get("groups", {})) != set(self.groups)
+            or "offsets" not in saved
+        ):
+            return False
+        self._maps = saved["maps"]
+        self._groups = saved["groups"]
+        self._offsets = saved["offsets"]
+        self.dead_rows = saved.get("dead_rows", 0)
+        stamp = self._replay_log(tuple(saved.get("stamp") or ()))
+        self._changes = []
+        if stamp != self._data_stamp():
+            self.reset()
+            return False
+        self._stamp = stamp
+        return True
+
+    def _replay_log(self, stamp: tuple) -> tuple:
+        """Applies log lines written on top of the given data file stamp,
+        returns the data file stamp the last applied line was written for"""
+        self._log_lines = 0
+        try:
+            with open(self._log_file, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.decoder.JSONDecodeError:
+                        # Last line may be cut short by an interrupted append
+                        break
+                    if tuple(entry["base"] or ()) != stamp:
+                        break
+                    for change in entry["changes"]:
+                        if change[0] == "put":
+                            self.put(change[1], change[2])
+                        else:
+                            self.discard(change[1])
+                    self.dead_rows = entry["dead_rows"]
+                    stamp = tuple(entry["stamp"])
+                    self._log_lines += 1
+        except OSError:
+            pass
+        return stamp
+
+    def rebuild(self, records) -> None:
+        """Builds maps from given records (dictionaries with "id" key)
+        and saves the index file"""
+        self.reset()
+        for record in records:
+            self.put(record)
+        self.save()
+
+    def reset(self) -> None:
+        """Drops maps, next load has to read index file or rebuild it"""
+        self._maps = {field: {} for field in self.fields}
+        self._groups = {field: {} for field in self.groups}
+        self._offsets = {}
+        self.dead_rows = 0
+        self._stamp = None
+        self._changes = []
+
+    def append(self) -> None:
+        """Appends changes made since the index was loaded for the data file
+        state it was loaded at to the log, and stamps the index with the
+        current data file state. Costs one short line whatever the index size"""
+        records = max([len(self._offsets)] + [len(m) for m in self._maps.values()])
+        if self._log_lines >= max(self.FOLD_AFTER, records // 2):
+            self.save()
+            return
+        entry = {
+            "base": self._stamp,
+            "stamp": self._data_stamp(),
+            "changes": self._changes,
+            "dead_rows": self.dead_rows,
+        }
+        with open(self._log_file, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._stamp = entry["stamp"]
+        self._changes = []
+        self._log_lines += 1
+
+    def save(self) -> None:
+        """Stamps the index with current data file state and writes it,
+        changes logged so far are folded into it"""
+        self._stamp = self._data_stamp()
+        self._changes = []
+        saved = {
+            "stamp": self._stamp,
+            "maps": self._maps,
+            "groups": self._groups,
+            "offsets": self._offsets,
+            "dead_rows": self.dead_rows,
+        }
+        with open(self._index_file, "w", encoding="utf-8") as handle:
+            json.dump(saved, handle)
+        if os.path.exists(self._log_file):
+            os.remove(self._log_file)
+        self._log_lines = 0
+
+    def get(self, field: str, value) -> str | None:
+        """Returns record ID for given field value"""
+        if value is None:
+            return None
+        return self._maps[field].get(str(value))
+
+    def get_group(self, field: str, value) -> list:
+        """Returns byte offsets of records having given grouping field value"""
+        return sorted(self._groups[field].get(str(value), []))
+
+    def offset(self, record_id) -> int | None:
+        """Returns byte offset of the record in the data file"""
+        return self._offsets.get(str(record_id))
+
+    def _logged(self, record: dict) -> dict:
+        """Record values the index keeps, written to the log"""
+        keys = ("id",) + tuple(self.fields) + tuple(self.groups)
+        return {key: record.get(key) for key in keys}
+
+    def put(self, record: dict, offset: int = None) -> None:
+        """Adds record field values and its byte offset to the maps"""
+        self._changes.append(["put", self._logged(record), offset])
+        record_id = str(record.get("id"))
+        for field in self.fields:
+            value = record.get(field)
+            if value not in (None, ""):
+                self._maps[field][str(value)] = record_id
+        if offset is None:
+            return
+        self._offsets[record_id] = offset
+        for field in self.groups:
+            self._groups[field].setdefault(str(record.get(field)), []).append(offset)
+
+    def discard(self, record: dict) -> None:
+        """Removes record field values which still point to this record"""
+        self._changes.append(["discard", self._logged(record)])
+        record_id = str(record.get("id"))
+        for field in self.fields:
+            value = str(record.get(field))
+            if self._maps[field].get(value) == record_id:
+                del self._maps[field][value]
+        offset = self._offsets.pop(record_id, None)
+        for field in self.groups:
+            group = self._groups[field].get(str(record.get(field)), [])
+            if offset in group:
+                group.remove(offset)
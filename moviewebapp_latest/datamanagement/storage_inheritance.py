@@ -1,6 +1,60 @@
 """Data managment interface"""
+import copy
 import os
 from abc import ABC, abstractmethod
+from functools import wraps
+from flask import g, has_request_context
+
+
+def synchronized(method):
+    """Runs a storage method holding the storage's _lock, storage instances
+    are shared by request threads"""
+
+    @wraps(method)
+    def locked_method(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return locked_method
+
+
+def request_snapshot(method):
+    """Read method result is kept in Flask g and given back to the same call
+    for the rest of the request, so a file is read once per request. g and
+    the snapshot with it are discarded at app context teardown.
+    Snapshot keeps a copy and hands out copies, so neither the storage's
+    in-memory data nor the snapshot is changed through a returned object.
+    Storage methods changing data must not call wrapped methods"""
+
+    @wraps(method)
+    def snapshot_method(self, *args, **kwargs):
+        if not has_request_context():
+            return method(self, *args, **kwargs)
+        snapshot = g.setdefault("storage_snapshot", {})
+        key = (self, method.__name__, args, tuple(sorted(kwargs.items())))
+        if key in snapshot:
+            return copy.deepcopy(snapshot[key])
+        # Results may be the storage's cached data, which writers of other
+        # requests change in place, so the caller gets a copy of its own too
+        snapshot[key] = copy.deepcopy(method(self, *args, **kwargs))
+        return copy.deepcopy(snapshot[key])
+
+    return snapshot_method
+
+
+def changes_snapshot(method):
+    """Write method drops the request snapshot, reads after it in the same
+    request see the change"""
+
+    @wraps(method)
+    def changing_method(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if has_request_context():
+                g.pop("storage_snapshot", None)
+
+    return changing_method
 
 
 class DataManagmentInterface(ABC):
@@ -10,11 +64,40 @@ class DataManagmentInterface(ABC):
     logs_dir = os.path.join(root_dir, "data")
 
     @abstractmethod
-    def get_all_users(self):
-        """Get all users from storage"""
+    def get_all_users(self, after_id=None, limit=None, after_name=None):
+        """Get all users from storage, or a keyset page of them: users
+        after the user after_id, at most limit of them. after_name is the
+        name of that user for storages ordering users by name"""
+        pass
+
+    @abstractmethod
+    def get_user_movies(self, user_id, after_id=None, limit=None):
+        """Get all movies for given user, or a keyset page of them"""
         pass
 
     @abstractmethod
-    def get_user_movies(self, user_id):
-        """Get all movies for given user"""
+    def find_users(self, user_ids) -> dict:
+        """{user ID: user} of the given user IDs in one read of the storage,
+        IDs which are not found are left out"""
         pass
+
+    @abstractmethod
+    def get_movies_for_users(self, user_ids) -> dict:
+        """{user ID: movies ordered by ID} of the given user IDs in one read,
+        a user without movies or an unknown ID gets an empty list"""
+        pass
+
+    @abstractmethod
+    def get_movies(self, user_id, movie_ids) -> dict:
+        """{movie ID: movie} of the given movie IDs in the user's list,
+        IDs which are not in the list are left out"""
+        pass
+
+    @staticmethod
+    def keyset_page(records, after_id=None, limit=None) -> list:
+        """Sorts records by their integer ID and returns the ones with ID
+        greater than after_id, at most limit of them"""
+        records = sorted(records, key=lambda record: int(record["id"]))
+        if after_id is not None:
+            records = [record for record in records if int(record["id"]) > int(after_id)]
+        return records[:limit]
@@ -1,16 +1,43 @@
 """Form and Flask session object related methods gathered here"""
-from flask import session
+import threading
+from flask import request, session
 
-from datamanagement.json_data_manager import JsonStorage, JsonStorageErrors
+from datamanagement.json_data_manager import (
+    JsonStorage,
+    JsonStorageErrors,
+    ShardedJsonStorage,
+)
 from datamanagement.sqlite_data_manager import SqliteStorage, SqliteErrors
 from datamanagement.csv_data_manager import CsvStorage, CsvStorageErrors
 from user.user_instance import UserErrors
 
 FILE_NAME = "movies"
+# JSON storage appends changes to a journal instead of rewriting the file
+JSON_JOURNAL = False
+# JSON storage keeps every user's movies in its own file under data/movies_shards
+JSON_SHARDED = False
+# CSV storage appends movie changes to movies.csv and leaves users.csv as is
+CSV_APPEND_ONLY = False
+# SQLite engine profile (SQLITE_PROFILES) of frontend and API apps
+SQLITE_PROFILE = "concurrent"
 SQLITE_STORAGE = SqliteStorage(FILE_NAME)
 SQLITE_STORAGE_PATH = SQLITE_STORAGE.filename
 
 IMPORTED_ERRORS = (CsvStorageErrors, JsonStorageErrors, SqliteErrors, UserErrors)
+# Storage registry: every storage type is constructed once per process and
+# shared by request threads of frontend and API apps
+STORAGE_FACTORIES = {
+    "json": lambda: (ShardedJsonStorage if JSON_SHARDED else JsonStorage)(
+        FILE_NAME, journal=JSON_JOURNAL
+    ),
+    "sqlite": lambda: SQLITE_STORAGE,
+    "csv": lambda: CsvStorage(FILE_NAME, append_only=CSV_APPEND_ONLY),
+}
+_storages = {}
+_storages_lock = threading.Lock()
+# Records on one page of list views and API list endpoints
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
 
 def clean_user_form(form):
@@ -31,15 +58,19 @@ def clean_session_keys():
 
 
 def get_storage_class(storage_text):
-    """Assigns class name to storage varible"""
+    """Returns the process wide storage instance of given storage type,
+    created on first use"""
     storage_text = storage_text.lower().strip()
-    if storage_text == "json":
-        storage = JsonStorage(FILE_NAME)
-    elif storage_text == "sqlite":
-        storage = SQLITE_STORAGE
-    elif storage_text == "csv":
-        storage = CsvStorage(FILE_NAME)
-    return storage
+    storage = _storages.get(storage_text)
+    if storage is not None:
+        return storage
+    if storage_text not in STORAGE_FACTORIES:
+        raise UserErrors(f"Unknown storage type {storage_text}")
+    with _storages_lock:
+        # Another thread may have created it while this one waited
+        if storage_text not in _storages:
+            _storages[storage_text] = STORAGE_FACTORIES[storage_text]()
+        return _storages[storage_text]
 
 
 def get_user_and_storage():
@@ -52,6 +83,29 @@ def get_user_and_storage():
     return user, storage
 
 
+def page_args() -> tuple[int | None, int]:
+    """after_id and limit query arguments of a keyset paged list, the
+    page is fetched with limit + 1 to find out if there is a next one"""
+    after_id = request.args.get("after_id", type=int)
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return after_id, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def split_page(records, limit, keys=("id",)) -> tuple[list, dict | None]:
+    """Page of records fetched with limit + 1 and the cursor query
+    arguments of the next page, {after_<key>: value} of the page's last
+    record for the given keys, None if there is no record after the page"""
+    if len(records) <= limit:
+        return records, None
+    page = records[:limit]
+    last = page[-1]
+    cursor = {
+        f"after_{key}": last[key] if isinstance(last, dict) else getattr(last, key)
+        for key in keys
+    }
+    return page, cursor
+
+
 def assign_session_values(data):
     """Creation session flask object values"""
     clean_session_keys()
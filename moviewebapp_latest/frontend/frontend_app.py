@@ -23,13 +23,10 @@ from frontend.movie_wtf import (
 
 app = Flask(__name__)
 app.secret_key = "mysecretkey"
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{ffasm.SQLITE_STORAGE_PATH}"
+ffasm.SQLITE_STORAGE.init_app(app, profile=ffasm.SQLITE_PROFILE)
 
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-migrate = Migrate(app, db)
+# SQLite can alter tables only in batch mode (copy and move)
+migrate = Migrate(app, db, render_as_batch=True)
 
 # Flask Login Set-Up
 login_manager = LoginManager()
@@ -85,8 +82,27 @@ def add_review(movie_id):
 def all_reviews():
     """Display all record in reviews table"""
     _, storage = ffasm.get_user_and_storage()
-    reviews = storage.all_revies()
-    return render_template("all_reviews.html", reviews=reviews)
+    after_id, limit = ffasm.page_args()
+    reviews = storage.review_feed(after_id=after_id, limit=limit + 1)
+    reviews, next_cursor = ffasm.split_page(reviews, limit)
+    return render_template(
+        "all_reviews.html", reviews=reviews, next_cursor=next_cursor
+    )
+
+
+@app.route("/search")
+def search():
+    """Full text search over SQLite movie titles and reviews"""
+    words = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    results = ffasm.SQLITE_STORAGE.search(
+        words, page=page, limit=ffasm.PAGE_SIZE, fetch=ffasm.PAGE_SIZE + 1
+    )
+    next_page = page + 1 if len(results) > ffasm.PAGE_SIZE else None
+    results = results[: ffasm.PAGE_SIZE]
+    return render_template(
+        "search.html", words=words, results=results, page=page, next_page=next_page
+    )
 
 
 @app.route("/dashboard")
@@ -177,13 +193,18 @@ def list_movies():
     userdata, storage = ffasm.get_user_and_storage()
     if not userdata and not storage:
         return redirect(url_for("signin"))
-    movies = storage.get_user_movies(userdata.get("id"))
+    after_id, limit = ffasm.page_args()
+    movies = storage.get_user_movies(
+        userdata.get("id"), after_id=after_id, limit=limit + 1
+    )
+    movies, next_cursor = ffasm.split_page(movies, limit)
     # flash_session_properties()
     return render_template(
         "movies.html",
         user_name=userdata.get("name"),
         movies=movies,
         user_id=userdata.get("id"),
+        next_cursor=next_cursor,
     )
 
 
@@ -218,11 +239,17 @@ def user_movies(user_id):
         return render_template(
             "index.html", title="WARNING!", warning="User does not exist"
         )
+    after_id, limit = ffasm.page_args()
     try:
-        movies = storage.get_user_movies(user_id=user_id)
+        movies = storage.get_user_movies(
+            user_id=user_id, after_id=after_id, limit=limit + 1
+        )
     except ffasm.IMPORTED_ERRORS as movie_err:
         abort(404, description=f"Movie ID is not valid {movie_err}")
-    return render_template("user_movies.html", user=user, movies=movies)
+    movies, next_cursor = ffasm.split_page(movies, limit)
+    return render_template(
+        "user_movies.html", user=user, movies=movies, next_cursor=next_cursor
+    )
 
 
 @app.route("/user-update/<int:user_id>", methods=["GET", "POST"])
@@ -268,8 +295,14 @@ def user_delete(user_id):
 def list_users():
     """Render the users page."""
     user, storage = ffasm.get_user_and_storage()
-    users = storage.get_all_users()
-    return render_template("users.html", user=user, users=users)
+    after_id, limit = ffasm.page_args()
+    users = storage.get_all_users(
+        after_id=after_id, limit=limit + 1, after_name=request.args.get("after_name")
+    )
+    users, next_cursor = ffasm.split_page(users, limit, keys=("name", "id"))
+    return render_template(
+        "users.html", user=user, users=users, next_cursor=next_cursor
+    )
 
 
 @app.route("/users/<int:user_id>/update_movie/<int:movie_id>", methods=["GET", "POST"])
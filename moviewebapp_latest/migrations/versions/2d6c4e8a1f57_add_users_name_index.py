@@ -0,0 +1,28 @@
+"""add users name index
+
+Users page is ordered by name and paged by (name, id)
+
+Revision ID: 2d6c4e8a1f57
+Revises: 9e7a3d5c8b12
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d6c4e8a1f57'
+down_revision = '9e7a3d5c8b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = sa.inspect(op.get_bind()).get_indexes('users')
+    if 'ix_users_name' not in [index['name'] for index in indexes]:
+        op.create_index('ix_users_name', 'users', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_name', table_name='users')
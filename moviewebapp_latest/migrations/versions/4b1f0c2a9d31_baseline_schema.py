@@ -0,0 +1,65 @@
+"""baseline schema
+
+Tables as db.create_all() made them before migrations were kept. Databases
+created by the app already have them, so only missing tables are created
+
+Revision ID: 4b1f0c2a9d31
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1f0c2a9d31'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'users' not in tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('username', sa.String(length=200), nullable=False),
+            sa.Column('email', sa.String(length=100), nullable=True),
+            sa.Column('date_added', sa.DateTime(), nullable=True),
+            sa.Column('password_hash', sa.String(length=128), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username'),
+        )
+    if 'movies' not in tables:
+        op.create_table(
+            'movies',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('Title', sa.String(length=200), nullable=False),
+            sa.Column('Year', sa.String(length=100), nullable=True),
+            sa.Column('imdbRating', sa.Float(), nullable=True),
+            sa.Column('Poster', sa.String(length=250), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'reviews' not in tables:
+        op.create_table(
+            'reviews',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('movie_id', sa.Integer(), nullable=True),
+            sa.Column('review_text', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['movie_id'], ['movies.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('reviews')
+    op.drop_table('movies')
+    op.drop_table('users')
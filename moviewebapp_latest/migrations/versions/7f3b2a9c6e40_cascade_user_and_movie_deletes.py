@@ -0,0 +1,59 @@
+"""cascade user and movie deletes
+
+Foreign keys of movies and reviews get ON DELETE CASCADE, so deleting a
+user or a movie deletes its rows in one statement. SQLite can not alter a
+foreign key, both tables are recreated in batch mode from their reflected
+schema with their data
+
+Revision ID: 7f3b2a9c6e40
+Revises: 2d6c4e8a1f57
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b2a9c6e40'
+down_revision = '2d6c4e8a1f57'
+branch_labels = None
+depends_on = None
+
+
+# Names batch mode gives to the unnamed foreign keys it reflects
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'
+}
+
+# (table, column, referred table) of the foreign keys getting ON DELETE
+FOREIGN_KEYS = [
+    ('movies', 'user_id', 'users'),
+    ('reviews', 'user_id', 'users'),
+    ('reviews', 'movie_id', 'movies'),
+]
+
+
+def _recreate(ondelete):
+    # Tables are reflected, so columns of databases made by db.create_all()
+    # or changed by later revisions are copied as they are
+    for table in ('movies', 'reviews'):
+        with op.batch_alter_table(
+            table, naming_convention=NAMING_CONVENTION, recreate='always'
+        ) as batch_op:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(
+                    name, referred, [column], ['id'], ondelete=ondelete
+                )
+
+
+def upgrade():
+    _recreate('CASCADE')
+
+
+def downgrade():
+    _recreate(None)
@@ -0,0 +1,78 @@
+"""add lookup indexes
+
+Composite (user_id, id) index on movies, user_id and movie_id indexes on
+reviews and unique username and email indexes on users. Databases made by
+db.create_all() after this change already have them. The unnamed UNIQUE
+constraints of the baseline users table are replaced by the named unique
+indexes, SQLite can not drop them in place so the table is recreated
+
+Revision ID: 9e7a3d5c8b12
+Revises: 4b1f0c2a9d31
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e7a3d5c8b12'
+down_revision = '4b1f0c2a9d31'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_movies_user_id_id', 'movies', ['user_id', 'id']),
+    ('ix_reviews_user_id', 'reviews', ['user_id']),
+    ('ix_reviews_movie_id', 'reviews', ['movie_id']),
+]
+
+USER_INDEXES = [
+    ('ix_users_username', ['username']),
+    ('ix_users_email', ['email']),
+]
+
+# Names batch mode gives to the unnamed constraints it reflects
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def _index_names(inspector, table):
+    return [index['name'] for index in inspector.get_indexes(table)]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in _index_names(inspector, table):
+            op.create_index(name, table, columns)
+    existing = _index_names(inspector, 'users')
+    missing = [(name, columns) for name, columns in USER_INDEXES if name not in existing]
+    if not missing:
+        return
+    constraints = [
+        constraint['column_names']
+        for constraint in inspector.get_unique_constraints('users')
+    ]
+    with op.batch_alter_table(
+        'users', naming_convention=NAMING_CONVENTION, recreate='always'
+    ) as batch_op:
+        for name, columns in missing:
+            if columns in constraints:
+                batch_op.drop_constraint(f'uq_users_{columns[0]}', type_='unique')
+            batch_op.create_index(name, columns, unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = _index_names(inspector, 'users')
+    present = [(name, columns) for name, columns in USER_INDEXES if name in existing]
+    if present:
+        with op.batch_alter_table(
+            'users', naming_convention=NAMING_CONVENTION, recreate='always'
+        ) as batch_op:
+            for name, columns in reversed(present):
+                batch_op.drop_index(name)
+                batch_op.create_unique_constraint(f'uq_users_{columns[0]}', columns)
+    for name, table, _ in reversed(INDEXES):
+        if name in _index_names(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,65 @@
+"""add movie catalog
+
+catalog table keeps OMDb metadata once per IMDb ID. movies rows link to it
+by imdbID and their Title, Year, imdbRating and Poster columns become
+nullable per user overrides. Existing rows have no imdbID and keep their
+values
+
+Revision ID: b5e1d7f0a3c8
+Revises: 7f3b2a9c6e40
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d7f0a3c8'
+down_revision = '7f3b2a9c6e40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'catalog' not in inspector.get_table_names():
+        op.create_table(
+            'catalog',
+            sa.Column('imdbID', sa.String(length=20), nullable=False),
+            sa.Column('Title', sa.String(length=200), nullable=False),
+            sa.Column('Year', sa.String(length=100), nullable=True),
+            sa.Column('imdbRating', sa.Float(), nullable=True),
+            sa.Column('Poster', sa.String(length=250), nullable=True),
+            sa.PrimaryKeyConstraint('imdbID'),
+        )
+    columns = [column['name'] for column in inspector.get_columns('movies')]
+    if 'imdbID' in columns:
+        return
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.add_column(sa.Column('imdbID', sa.String(length=20), nullable=True))
+        batch_op.alter_column(
+            'Title', existing_type=sa.String(length=200), nullable=True
+        )
+        batch_op.create_foreign_key(
+            'fk_movies_imdbID_catalog', 'catalog', ['imdbID'], ['imdbID']
+        )
+        batch_op.create_index('ix_movies_imdbID', ['imdbID'], unique=False)
+
+
+def downgrade():
+    # Catalog values of linked movies are copied back into their rows
+    for column in ('Title', 'Year', 'imdbRating', 'Poster'):
+        op.execute(
+            f'UPDATE movies SET "{column}" = (SELECT catalog."{column}" '
+            'FROM catalog WHERE catalog."imdbID" = movies."imdbID") '
+            f'WHERE "{column}" IS NULL AND "imdbID" IS NOT NULL'
+        )
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_index('ix_movies_imdbID')
+        batch_op.drop_constraint('fk_movies_imdbID_catalog', type_='foreignkey')
+        batch_op.alter_column(
+            'Title', existing_type=sa.String(length=200), nullable=False
+        )
+        batch_op.drop_column('imdbID')
+    op.drop_table('catalog')
@@ -0,0 +1,114 @@
+"""add user aggregates
+
+users get movie_count, rating_sum, rated_count, last_movie_added and
+review_count columns kept by triggers on movies, catalog and reviews, filled
+from existing rows. last_movie_added of existing users stays NULL, movies
+have no added date
+
+Revision ID: c8d2f6a4b913
+Revises: e2a9c4b6d810
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d2f6a4b913'
+down_revision = 'e2a9c4b6d810'
+branch_labels = None
+depends_on = None
+
+
+def movie_rating_sql(row):
+    return (
+        f'coalesce({row}."imdbRating", '
+        f'(SELECT "imdbRating" FROM catalog WHERE "imdbID" = {row}."imdbID"))'
+    )
+
+
+def user_stats_sql(row, sign, added=False):
+    rating = movie_rating_sql(row)
+    last_added = ", last_movie_added = CURRENT_TIMESTAMP" if added else ""
+    return (
+        f"UPDATE users SET movie_count = movie_count {sign} 1, "
+        f"rating_sum = rating_sum {sign} coalesce({rating}, 0), "
+        f"rated_count = rated_count {sign} ({rating} IS NOT NULL){last_added} "
+        f"WHERE id = {row}.user_id;"
+    )
+
+
+CATALOG_MOVIES_SQL = (
+    'FROM movies WHERE user_id = users.id AND "imdbID" = new."imdbID" '
+    'AND "imdbRating" IS NULL'
+)
+USER_STATS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_insert AFTER INSERT ON movies "
+    f"BEGIN {user_stats_sql('new', '+', added=True)} END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_update AFTER UPDATE OF "
+    '"imdbRating", "imdbID", user_id ON movies BEGIN '
+    f"{user_stats_sql('old', '-')} {user_stats_sql('new', '+')} END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_movie_delete AFTER DELETE ON movies "
+    f"BEGIN {user_stats_sql('old', '-')} END",
+    'CREATE TRIGGER IF NOT EXISTS user_stats_catalog_update AFTER UPDATE OF '
+    '"imdbRating" ON catalog WHEN old."imdbRating" IS NOT new."imdbRating" BEGIN '
+    "UPDATE users SET rating_sum = rating_sum + (SELECT count(*) * "
+    '(coalesce(new."imdbRating", 0) - coalesce(old."imdbRating", 0)) '
+    f"{CATALOG_MOVIES_SQL}), rated_count = rated_count + (SELECT count(*) * "
+    '((new."imdbRating" IS NOT NULL) - (old."imdbRating" IS NOT NULL)) '
+    f"{CATALOG_MOVIES_SQL}) WHERE id IN (SELECT user_id FROM movies "
+    'WHERE "imdbID" = new."imdbID" AND "imdbRating" IS NULL); END',
+    "CREATE TRIGGER IF NOT EXISTS user_stats_review_insert AFTER INSERT ON reviews "
+    "BEGIN UPDATE users SET review_count = review_count + 1 "
+    "WHERE id = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS user_stats_review_delete AFTER DELETE ON reviews "
+    "BEGIN UPDATE users SET review_count = review_count - 1 "
+    "WHERE id = old.user_id; END",
+]
+TRIGGERS = [
+    'user_stats_movie_insert', 'user_stats_movie_update',
+    'user_stats_movie_delete', 'user_stats_catalog_update',
+    'user_stats_review_insert', 'user_stats_review_delete',
+]
+COUNTERS = ['movie_count', 'rated_count', 'review_count']
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = [column['name'] for column in inspector.get_columns('users')]
+    if 'movie_count' not in columns:
+        with op.batch_alter_table('users') as batch_op:
+            for counter in COUNTERS:
+                batch_op.add_column(
+                    sa.Column(counter, sa.Integer(), nullable=False, server_default='0')
+                )
+            batch_op.add_column(
+                sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0')
+            )
+            batch_op.add_column(
+                sa.Column('last_movie_added', sa.DateTime(), nullable=True)
+            )
+    for statement in USER_STATS_DDL:
+        op.execute(statement)
+    # Counted again for a database made by db.create_all() as well
+    rating = 'coalesce(movies."imdbRating", catalog."imdbRating")'
+    rated_movies = (
+        'FROM movies LEFT JOIN catalog ON catalog."imdbID" = movies."imdbID" '
+        'WHERE movies.user_id = users.id'
+    )
+    op.execute(
+        'UPDATE users SET '
+        'movie_count = (SELECT count(*) FROM movies WHERE user_id = users.id), '
+        f'rating_sum = (SELECT coalesce(sum({rating}), 0) {rated_movies}), '
+        f'rated_count = (SELECT count({rating}) {rated_movies}), '
+        'review_count = (SELECT count(*) FROM reviews WHERE user_id = users.id)'
+    )
+
+
+def downgrade():
+    for trigger in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    with op.batch_alter_table('users') as batch_op:
+        for column in COUNTERS + ['rating_sum', 'last_movie_added']:
+            batch_op.drop_column(column)
@@ -0,0 +1,78 @@
+"""add full text search
+
+FTS5 tables movies_fts (rowid = movies.id) and reviews_fts
+(rowid = reviews.id) kept in sync by triggers, filled with existing rows.
+Recreating movies or reviews in batch mode drops their triggers, a later
+revision doing it has to run SEARCH_DDL again
+
+Revision ID: e2a9c4b6d810
+Revises: b5e1d7f0a3c8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4b6d810'
+down_revision = 'b5e1d7f0a3c8'
+branch_labels = None
+depends_on = None
+
+MOVIE_TITLE_SQL = (
+    'coalesce(new."Title", '
+    '(SELECT "Title" FROM catalog WHERE "imdbID" = new."imdbID"))'
+)
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+    "title, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5("
+    "review_text, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN "
+    f"INSERT INTO movies_fts(rowid, title) VALUES (new.id, {MOVIE_TITLE_SQL}); END",
+    'CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF "Title", '
+    '"imdbID" ON movies BEGIN '
+    f"UPDATE movies_fts SET title = {MOVIE_TITLE_SQL} WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN "
+    "DELETE FROM movies_fts WHERE rowid = old.id; END",
+    'CREATE TRIGGER IF NOT EXISTS catalog_fts_update AFTER UPDATE OF "Title" '
+    'ON catalog BEGIN UPDATE movies_fts SET title = new."Title" WHERE rowid IN '
+    '(SELECT id FROM movies WHERE "imdbID" = new."imdbID" AND "Title" IS NULL); END',
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN "
+    "INSERT INTO reviews_fts(rowid, review_text) "
+    "VALUES (new.id, new.review_text); END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review_text "
+    "ON reviews BEGIN UPDATE reviews_fts SET review_text = new.review_text "
+    "WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN "
+    "DELETE FROM reviews_fts WHERE rowid = old.id; END",
+]
+TRIGGERS = [
+    'movies_fts_insert', 'movies_fts_update', 'movies_fts_delete',
+    'catalog_fts_update', 'reviews_fts_insert', 'reviews_fts_update',
+    'reviews_fts_delete',
+]
+
+
+def upgrade():
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    # Rows of a database made by db.create_all() are indexed already
+    op.execute('DELETE FROM movies_fts')
+    op.execute('DELETE FROM reviews_fts')
+    op.execute(
+        'INSERT INTO movies_fts(rowid, title) '
+        'SELECT movies.id, coalesce(movies."Title", catalog."Title") '
+        'FROM movies LEFT JOIN catalog ON catalog."imdbID" = movies."imdbID"'
+    )
+    op.execute(
+        'INSERT INTO reviews_fts(rowid, review_text) '
+        'SELECT id, review_text FROM reviews'
+    )
+
+
+def downgrade():
+    for trigger in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS reviews_fts')
+    op.execute('DROP TABLE IF EXISTS movies_fts')
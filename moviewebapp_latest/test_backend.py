@@ -1,13 +1,27 @@
 """testing backend.backend_api.py to run to this script flask app has to be run
 then you can run this script"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
 import types
 from flask import Flask
 from backend.request_movie import requests, extract_movie_data
 from datamanagement.sqlite_data_manager import SqliteStorage
+from datamanagement.sqlite_models import db, User, Movie
+from datamanagement.storage_inheritance import DataManagmentInterface as DMI
+from datamanagement.json_data_manager import JsonStorage, ShardedJsonStorage
+from datamanagement.csv_data_manager import CsvStorage
 
 app = Flask(__name__)
 session = requests.Session()
 storage = SqliteStorage("movies")
+# Seconds a worker may spend importing the frontend application
+IMPORT_TIME_BUDGET = 1.5
+# Calls of every query timed by sqlite statement cache benchmark
+BENCHMARK_CALLS = 2000
 
 
 def api_login_test():
@@ -80,6 +94,156 @@ def api_add_movie():
     print(response.json())
 
 
+def frontend_import_time():
+    """Imports frontend.frontend_app in a new interpreter, checks import time
+    against IMPORT_TIME_BUDGET and that pandas is not imported"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import frontend.frontend_app\n"
+        "print(time.perf_counter() - start, 'pandas' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, pandas_imported = result.stdout.split()
+    within_budget = float(seconds) <= IMPORT_TIME_BUDGET
+    print(
+        f"frontend.frontend_app imported in {float(seconds):.3f}s "
+        f"(budget {IMPORT_TIME_BUDGET}s), pandas imported: {pandas_imported}"
+    )
+    print("PASSED" if within_budget and pandas_imported == "False" else "FAILED")
+
+
+def sqlite_statement_cache_benchmark():
+    """Times SqliteStorage hot queries against the ORM query API calls they
+    replaced, on data/benchmark.db, per call microseconds"""
+    bench_app = Flask("benchmark")
+    bench_storage = SqliteStorage("benchmark")
+    bench_storage.init_app(bench_app)
+    with bench_app.app_context():
+        if bench_storage.find_user(username="bench") is None:
+            bench_storage.add_new_user(
+                {"name": "Bench", "username": "bench", "email": "b@b", "password": "1"}
+            )
+            user_id = bench_storage.find_user(username="bench").id
+            for number in range(50):
+                movie = {"Title": f"Movie {number}", "Year": "2000"}
+                bench_storage.add_movie_in_user_list({"id": user_id, "movie": movie})
+        user_id = bench_storage.find_user(username="bench").id
+        movie_id = bench_storage.get_user_movies(user_id)[0].id
+        queries = {
+            "find user by id": (
+                lambda: User.query.get(user_id),
+                lambda: bench_storage.find_user(user_id=user_id),
+            ),
+            "find user by username": (
+                lambda: User.query.filter_by(username="bench").first(),
+                lambda: bench_storage.find_user(username="bench"),
+            ),
+            "get target movie": (
+                lambda: Movie.query.filter_by(user_id=user_id, id=movie_id).first(),
+                lambda: bench_storage.get_target_movie(user_id, movie_id),
+            ),
+            "get user movies": (
+                lambda: db.session.get(User, user_id)
+                and Movie.query.filter(Movie.user_id == user_id)
+                .order_by(Movie.id)
+                .limit(20)
+                .all(),
+                lambda: bench_storage.get_user_movies(user_id, limit=20),
+            ),
+        }
+        for name, (query_api, cached) in queries.items():
+            timings = []
+            for function in (query_api, cached):
+                function()
+                seconds = timeit.timeit(function, number=BENCHMARK_CALLS)
+                timings.append(seconds / BENCHMARK_CALLS * 1e6)
+            print(
+                f"{name}: query API {timings[0]:.1f}us, "
+                f"cached statement {timings[1]:.1f}us"
+            )
+        db.session.remove()
+
+
+def json_sharded_conversion_signup():
+    """Converts a single file JSON storage to sharded layout in a temporary
+    data directory and signs up a new user on the converted storage"""
+    logs_dir = DMI.logs_dir
+    with tempfile.TemporaryDirectory() as temp_dir:
+        DMI.logs_dir = temp_dir
+        try:
+            single = JsonStorage("movies")
+            single.add_new_user(
+                {
+                    "name": "First",
+                    "username": "first",
+                    "email": "first@x",
+                    "password": "123456",
+                    "storage": single,
+                }
+            )
+            single.add_movie_in_user_list(
+                {"id": 1, "movie": {"Title": "Movie", "Year": "2000"}}
+            )
+            sharded = ShardedJsonStorage.convert_single_file("movies")
+            sharded.add_new_user(
+                {
+                    "name": "Second",
+                    "username": "second",
+                    "email": "second@x",
+                    "password": "123456",
+                    "storage": sharded,
+                }
+            )
+            user = sharded.find_user(username="second")
+            passed = user is not None and int(user.id) == 2
+        finally:
+            DMI.logs_dir = logs_dir
+    print("PASSED" if passed else "FAILED")
+
+
+def csv_concurrent_signups():
+    """Signs up users from two threads on CSV storages of different movie
+    files, which share users.csv, in a temporary data directory"""
+    logs_dir = DMI.logs_dir
+    with tempfile.TemporaryDirectory() as temp_dir:
+        DMI.logs_dir = temp_dir
+        try:
+            storages = [CsvStorage("movies"), CsvStorage("other_movies")]
+
+            def sign_up(storage, prefix):
+                for number in range(10):
+                    storage.add_new_user(
+                        {
+                            "name": f"{prefix} {number}",
+                            "username": f"{prefix}{number}",
+                            "email": f"{prefix}{number}@x",
+                            "password": "123456",
+                            "storage": storage,
+                        }
+                    )
+
+            threads = [
+                threading.Thread(target=sign_up, args=(storage, f"user{position}"))
+                for position, storage in enumerate(storages)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            ids = [int(user.id) for user in CsvStorage("movies").get_all_users()]
+            passed = sorted(ids) == list(range(1, 21))
+        finally:
+            DMI.logs_dir = logs_dir
+    print("PASSED" if passed else "FAILED")
+
+
 def main():
     """Run the test according user choice"""
 